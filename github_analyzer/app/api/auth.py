@@ -1,8 +1,12 @@
+import asyncio
+from typing import Optional
 from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import RedirectResponse
 from authlib.integrations.starlette_client import OAuth
 from starlette.middleware.sessions import SessionMiddleware
 from app.config import settings
+from app.utils.github_client import github_client
+from app.utils.session_store import session_store
 
 router = APIRouter()
 
@@ -19,8 +23,31 @@ oauth.register(
     client_kwargs={'scope': 'repo admin:repo_hook'},
 )
 
+async def fetch_profile(access_token: str) -> dict:
+    user_info = await github_client.get('/user', access_token)
+    return {
+        'login': user_info.get('login'),
+        'name': user_info.get('name'),
+        'avatar_url': user_info.get('avatar_url'),
+        'id': user_info.get('id'),
+    }
+
+async def current_user(request: Request) -> Optional[dict]:
+    """Usuário da sessão: o cookie guarda só o ID opaco; token e perfil ficam no session_store."""
+    session_id = request.session.get('sid')
+    if not session_id:
+        return None
+    session = await asyncio.to_thread(session_store.get, session_id)
+    if not session:
+        return None
+    access_token = session['access_token']
+    profile = await session_store.cached(
+        session['id'], 'profile', lambda: fetch_profile(access_token), settings.user_cache_ttl_seconds
+    )
+    return {**profile, 'access_token': access_token}
+
 async def get_user(request: Request):
-    user = request.session.get('user')
+    user = await current_user(request)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     return user
@@ -41,21 +68,20 @@ async def auth_callback(request: Request):
     token = await oauth.github.authorize_access_token(request)
     
     # Buscar informações do usuário do GitHub
-    user_response = await oauth.github.get('user', token=token)
-    user_info = user_response.json()
+    profile = await fetch_profile(token['access_token'])
     
-    # Salvar token e informações do usuário na sessão
-    request.session['user'] = {
-        'access_token': token['access_token'],
-        'login': user_info.get('login'),
-        'name': user_info.get('name'),
-        'avatar_url': user_info.get('avatar_url'),
-        'id': user_info.get('id')
-    }
+    # Token e perfil ficam no servidor; o cookie carrega apenas o ID da sessão
+    session_id = await asyncio.to_thread(session_store.create, profile['id'], token['access_token'])
+    await asyncio.to_thread(session_store.set_cached, profile['id'], 'profile', profile, settings.user_cache_ttl_seconds)
+    request.session.clear()
+    request.session['sid'] = session_id
     
     return RedirectResponse(url='/dashboard')
 
 @router.get('/logout')
 async def logout(request: Request):
+    session_id = request.session.get('sid')
+    if session_id:
+        await asyncio.to_thread(session_store.delete, session_id)
     request.session.clear()
     return RedirectResponse(url='/')
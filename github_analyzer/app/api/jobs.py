@@ -0,0 +1,73 @@
+import asyncio
+import json
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.api.auth import get_user
+from app.api.repositories import user_repositories
+from app.core_analysis.job_queue import DONE, FAILED, SUPERSEDED, job_queue
+
+router = APIRouter()
+
+TERMINAL_STATUSES = (DONE, FAILED, SUPERSEDED)
+EVENT_POLL_SECONDS = 0.5
+KEEPALIVE_SECONDS = 15
+
+async def accessible_repos(user: dict) -> set:
+    """Repositórios (owner/repo, em minúsculas) cujos jobs o usuário pode ver."""
+    return {repo['full_name'].lower() for repo in await user_repositories(user)}
+
+async def get_owned_job(job_id: int, user: dict) -> dict:
+    """O job, se for de um repositório do usuário; jobs de outros usuários respondem 404 como inexistentes."""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None or job['repo'].lower() not in await accessible_repos(user):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs")
+async def list_jobs(repo: Optional[str] = None, limit: int = 50, user: dict = Depends(get_user)):
+    repos = await accessible_repos(user)
+    return await asyncio.to_thread(job_queue.list, repo=repo, limit=min(limit, 200), repos=repos)
+
+@router.get("/jobs/queue")
+async def queue_depth(user: dict = Depends(get_user)):
+    return await asyncio.to_thread(job_queue.depth, await accessible_repos(user))
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: int, user: dict = Depends(get_user)):
+    return await get_owned_job(job_id, user)
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: int, request: Request, user: dict = Depends(get_user)):
+    """Server-Sent Events com o progresso por nó e os tokens do relatório do job."""
+    # Checked before the stream opens: events carry the report of the user's repository
+    await get_owned_job(job_id, user)
+    last_id = int(request.headers.get("last-event-id") or 0)
+
+    async def stream():
+        nonlocal last_id
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            # Read the status before the events so nothing written before it turned terminal is missed
+            job = await asyncio.to_thread(job_queue.get, job_id)
+            events = await asyncio.to_thread(job_queue.events_after, job_id, last_id)
+            for event in events:
+                last_id = event["id"]
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+            if events:
+                last_sent = time.monotonic()
+                continue
+            if job is None or job["status"] in TERMINAL_STATUSES:
+                yield f"event: end\ndata: {json.dumps({'status': job and job['status']})}\n\n"
+                return
+            if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
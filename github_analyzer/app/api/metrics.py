@@ -0,0 +1,17 @@
+import asyncio
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core_analysis.job_queue import job_queue
+from app.utils.metrics import registry
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas de todos os processos no formato de texto do Prometheus."""
+    depth = await asyncio.to_thread(job_queue.depth)
+    gauges = {
+        "analyzer_jobs": ("Jobs currently queued or running.", {f'status="{status}"': count for status, count in depth.items()}),
+    }
+    body = await asyncio.to_thread(registry.render, gauges)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -1,15 +1,32 @@
+import asyncio
+import httpx
 from fastapi import APIRouter, Depends, Request, HTTPException
-from app.api.auth import get_user, oauth
+from app.api.auth import get_user
 from app.config import settings
+from app.utils.github_client import GitHubRateLimited, github_client
+from app.utils.session_store import session_store
 
 router = APIRouter()
 
+async def user_repositories(user: dict) -> list:
+    """Repositórios do usuário no GitHub, do cache por usuário; também define quais jobs ele pode ver."""
+    # Servida do cache por usuário; o GitHub (todas as páginas, com requisições condicionais)
+    # só é consultado na primeira vez ou em segundo plano quando o TTL vence
+    try:
+        return await session_store.cached(
+            user['id'],
+            'repositories',
+            lambda: github_client.list_user_repos(user['access_token']),
+            settings.user_cache_ttl_seconds,
+        )
+    except GitHubRateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
 @router.get("/repositories")
-async def list_repositories(request: Request, user: dict = Depends(get_user)):
-    token = {'access_token': user['access_token']}
-    resp = await oauth.github.get('user/repos?sort=updated&per_page=100', token=token)
-    resp.raise_for_status()
-    return resp.json()
+async def list_repositories(request: Request, refresh: bool = False, user: dict = Depends(get_user)):
+    if refresh:
+        await asyncio.to_thread(session_store.invalidate, user['id'], 'repositories')
+    return await user_repositories(user)
 
 @router.post("/repositories/{owner}/{repo}/select")
 async def select_repository(owner: str, repo: str, request: Request, user: dict = Depends(get_user)):
@@ -32,16 +49,10 @@ async def select_repository(owner: str, repo: str, request: Request, user: dict
         },
     }
     
-    token = {'access_token': user['access_token']}
-    resp = await oauth.github.post(
-        f"repos/{owner}/{repo}/hooks",
-        token=token,
-        json=hook_data,
-    )
-    
     try:
-        resp.raise_for_status()
-    except Exception as e:
+        hook = await github_client.create_hook(user['access_token'], owner, repo, hook_data)
+    except (httpx.HTTPStatusError, GitHubRateLimited) as e:
         raise HTTPException(status_code=400, detail=f"Failed to create webhook: {str(e)}")
 
-    return resp.json()
+    await asyncio.to_thread(session_store.invalidate, user['id'], 'repositories')
+    return hook
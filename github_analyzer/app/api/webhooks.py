@@ -1,9 +1,18 @@
+import asyncio
+import fnmatch
 import hmac
 import hashlib
-from fastapi import APIRouter, Request, BackgroundTasks, HTTPException
+import json
+from typing import Optional
+from fastapi import APIRouter, Request, HTTPException
 from app.config import settings
-from app.core_analysis.graph import app as analysis_graph
-from app.core_analysis.state import AgentState
+from app.core_analysis.job_queue import job_queue
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 router = APIRouter()
 
@@ -21,32 +30,73 @@ def verify_signature(request: Request, body: bytes):
     if not hmac.compare_digest(expected_signature, signature):
         raise HTTPException(status_code=403, detail="Invalid signature")
 
-async def run_analysis_pipeline(repo_url: str, commit_hash: str):
-    initial_state = AgentState(
-        repo_url=repo_url,
-        clone_path="",
-        language="",
-        framework="",
-        existing_doc_score=None,
-        code_units=[],
-        commit_analysis=[],
-        final_report="",
-        processing_log=[],
-        error=None,
-    )
-    config = {"configurable": {"thread_id": commit_hash}}
-    await analysis_graph.ainvoke(initial_state, config=config)
+def ignored_paths(repo: str, paths: set) -> bool:
+    """True quando todos os arquivos alterados casam com a lista de ignorados do repositório."""
+    patterns = settings.webhook_ignore_paths.get(repo, []) + settings.webhook_ignore_paths.get("*", [])
+    if not patterns or not paths:
+        return False
+    return all(any(fnmatch.fnmatch(path, pattern) for pattern in patterns) for path in paths)
+
+def skip_reason(payload: dict) -> Optional[str]:
+    """Motivo para não analisar o push, ou None se ele deve ser enfileirado."""
+    repository = payload.get("repository") or {}
+    if "clone_url" not in repository or "after" not in payload:
+        return "not a push payload"
+
+    ref = payload.get("ref", "")
+    if ref.startswith("refs/tags/"):
+        return "tag push"
+    if payload.get("deleted") or set(payload["after"]) == {"0"}:
+        return "branch deletion"
+    default_branch = repository.get("default_branch") or repository.get("master_branch")
+    if default_branch and ref != f"refs/heads/{default_branch}":
+        return f"push to {ref}, not the default branch"
+
+    # The payload lists changed files per commit, so docs-only pushes are caught without cloning
+    paths = {
+        path
+        for commit in payload.get("commits") or []
+        for key in ("added", "modified", "removed")
+        for path in commit.get(key) or []
+    }
+    if ignored_paths(repository.get("full_name", ""), paths):
+        return "only ignored paths changed"
+    return None
 
 @router.post("/webhook/event", name="webhook_event")
-async def webhook_event(request: Request, background_tasks: BackgroundTasks):
+async def webhook_event(request: Request):
     body = await request.body()
     verify_signature(request, body)
-    
-    payload = await request.json()
-    
-    if "repository" in payload and "clone_url" in payload["repository"] and "after" in payload:
-        repo_url = payload["repository"]["clone_url"]
-        commit_hash = payload["after"]
-        background_tasks.add_task(run_analysis_pipeline, repo_url, commit_hash)
-
-    return {"message": "Webhook received"}
+
+    event = request.headers.get("X-GitHub-Event", "push")
+    if event == "ping":
+        return {"message": "pong"}
+    if event != "push":
+        return {"message": f"Ignored event: {event}"}
+
+    # Parsed once from the bytes already read for the signature check
+    try:
+        payload = json_loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    reason = skip_reason(payload)
+    if reason:
+        return {"message": f"Webhook ignored: {reason}"}
+
+    repo_url = payload["repository"]["clone_url"]
+    repo = payload["repository"].get("full_name") or repo_url
+    commit_hash = payload["after"]
+    base_commit = payload.get("before")
+
+    delivery_id = request.headers.get("X-GitHub-Delivery")
+    if delivery_id:
+        job_id, duplicate = await asyncio.to_thread(
+            job_queue.enqueue_delivery, delivery_id, repo, repo_url, commit_hash, base_commit,
+            settings.webhook_delivery_history,
+        )
+        if duplicate:
+            return {"message": "Duplicate delivery ignored", "job_id": job_id}
+    else:
+        job_id = await asyncio.to_thread(job_queue.enqueue, repo, repo_url, commit_hash, base_commit)
+    return {"message": "Webhook received", "job_id": job_id}
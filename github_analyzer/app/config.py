@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Dict, List
 
 class Settings(BaseSettings):
     github_client_id: str
@@ -9,6 +10,121 @@ class Settings(BaseSettings):
     webhook_secret: str
     session_secret_key: str
     base_url: str = "http://127.0.0.1:8088"  # URL base da aplicação (será substituída pelo ngrok)
+    openai_base_url: str = "https://api.openai.com/v1"  # Aponte para benchmarks/fake_openai.py em testes locais
+
+    # Cliente da API do GitHub (app/utils/github_client.py)
+    github_api_url: str = "https://api.github.com"
+    github_max_retries: int = 3
+    github_rate_limit_max_wait_seconds: int = 60  # Esperas maiores falham em vez de segurar a requisição
+    github_etag_cache_entries: int = 1024  # Respostas guardadas para requisições condicionais (por processo)
+    github_page_concurrency: int = 4
+
+    # Diretório para dados persistentes locais (caches, índices, filas)
+    data_dir: str = "/tmp/github_analyzer"
+
+    # Número máximo de chamadas ao LLM disparadas por agente (deconstructor, security); quantas chegam
+    # de fato à API ao mesmo tempo é decidido pelo limitador AIMD do transporte (LLM_CONCURRENCY_*)
+    llm_max_concurrency: int = 32
+
+    # Transporte do OpenAIClient (app/utils/llm_transport.py)
+    llm_timeout_seconds: float = 120.0  # Leitura/escrita; a conexão usa llm_connect_timeout_seconds
+    llm_connect_timeout_seconds: float = 10.0
+    llm_max_connections: int = 64
+    llm_max_retries: int = 4  # 408, 429, 5xx, timeouts e erros de conexão
+    llm_backoff_base_seconds: float = 0.5  # Backoff exponencial com jitter quando não há Retry-After
+    llm_backoff_max_seconds: float = 30.0
+    llm_retry_max_wait_seconds: float = 60.0  # Retry-After maior que isso falha em vez de esperar
+    llm_concurrency_initial: int = 8  # Limite AIMD de requisições em voo por processo
+    llm_concurrency_min: int = 1
+    llm_concurrency_max: int = 64
+    llm_circuit_failure_threshold: int = 5  # Falhas seguidas que abrem o circuito
+    llm_circuit_reset_seconds: float = 30.0
+
+    # Reprocessa apenas os arquivos alterados desde o último commit indexado
+    incremental_analysis: bool = True
+
+    # Reaproveita documentação e vulnerabilidades de unidades equivalentes (mesma árvore sintática
+    # normalizada) já analisadas em qualquer repositório
+    fingerprint_store_enabled: bool = True
+
+    # Diretórios nunca percorridos pelo manifesto do repositório, além dos ignorados pelo .gitignore
+    manifest_ignored_dirs: List[str] = [
+        '.git', '.hg', '.svn', 'node_modules', 'bower_components', 'venv', '.venv', 'vendor',
+        '__pycache__', '.tox', '.mypy_cache', '.pytest_cache', 'site-packages',
+    ]
+
+    # Fila de análises (app.worker)
+    analysis_worker_concurrency: int = 2  # Jobs simultâneos por processo worker
+    job_poll_interval_seconds: float = 2.0
+    job_lease_seconds: int = 300  # Sem heartbeat por esse tempo, o job volta para a fila
+    job_event_retention_seconds: int = 24 * 3600  # Eventos de progresso (SSE) mais antigos são apagados
+
+    # Sessões no servidor (DATA_DIR/sessions.sqlite3); o cookie guarda apenas o ID
+    session_ttl_seconds: int = 7 * 24 * 3600
+    user_cache_ttl_seconds: int = 300  # Lista de repositórios e perfil; vencidos são atualizados em segundo plano
+
+    # Webhooks: pushes cujos arquivos alterados casam todos com estes padrões (fnmatch) não são analisados.
+    # JSON por repositório, com "*" valendo para todos, ex.: {"*": ["docs/*", "*.md"], "org/repo": ["assets/*"]}
+    webhook_ignore_paths: Dict[str, List[str]] = {}
+    webhook_delivery_history: int = 10000  # IDs de X-GitHub-Delivery lembrados para descartar reenvios
+
+    # Intervalo em que cada processo grava suas métricas em DATA_DIR/metrics.sqlite3
+    metrics_flush_seconds: float = 10.0
+
+    # Checkpoints do grafo (DATA_DIR/checkpoints.sqlite3) são removidos após esse tempo
+    checkpoint_retention_seconds: int = 7 * 24 * 3600
+
+    # Cota de disco dos espelhos git em DATA_DIR/mirrors (remoção LRU acima disso)
+    workspace_max_bytes: int = 20 * 1024 * 1024 * 1024
+
+    # Pool de processos do parsing com tree-sitter (0 = um processo por CPU)
+    parser_processes: int = 0
+    parser_batch_size: int = 64
+
+    # Modo em lote: várias unidades pequenas por requisição, com documentação e SAST juntos
+    llm_batch_mode: bool = False
+    llm_batch_token_budget: int = 6000  # Tokens de código por requisição
+    llm_batch_max_units: int = 20
+    llm_batch_single_unit_tokens: int = 1500  # Acima disso a unidade vai sozinha
+    llm_batch_output_tokens: int = 4096  # Teto da resposta de um lote
+    llm_batch_output_tokens_per_unit: int = 600  # Docstring e vulnerabilidades em JSON; limita as unidades por lote
+
+    # Roteamento de modelos (OpenAIClient.route): vale a primeira regra cujo `task` casa e cujos limites
+    # opcionais são respeitados (`max_tokens` do prompt, `max_complexity` ciclomática da unidade).
+    # Sem regra aplicável, usa LLM_DEFAULT_TIER. JSON, ex.: [{"task": "documentation", "max_tokens": 800, "tier": "small"}]
+    llm_model_tiers: Dict[str, str] = {"small": "gpt-4o-mini", "large": "gpt-4o"}
+    llm_default_tier: str = "large"
+    llm_routing_policy: List[dict] = [
+        {"task": "commit_summary", "tier": "small"},
+        {"task": "readme_evaluation", "tier": "small"},
+        {"task": "module_summary", "tier": "small"},
+        {"task": "documentation", "max_tokens": 1500, "max_complexity": 10, "tier": "small"},
+        {"task": "security", "max_tokens": 1500, "max_complexity": 10, "tier": "small"},
+        {"task": "batch", "max_complexity": 10, "tier": "small"},
+        # summary_merge e synthesis (sumário executivo) ficam no modelo grande
+    ]
+
+    # Orçamento de tokens (contagem local, sem rede)
+    llm_context_window: int = 128000  # Requisições maiores são rejeitadas antes do envio
+    unit_max_tokens: int = 3000  # Código de uma unidade enviado em um único prompt
+    readme_max_tokens: int = 6000
+    job_token_ceiling: int = 2000000  # Teto por job (0 = sem limite)
+
+    # Pré-análise SAST local por regras: só unidades com achados ou que tocam entrada externa vão ao LLM
+    sast_prefilter: bool = True
+
+    # Commits mais recentes analisados pelo agente de evolução (a partir do commit analisado)
+    evolution_commit_window: int = 10
+
+    # Síntese hierárquica do relatório: resumos por módulo reduzidos pelo LLM
+    synthesis_module_digest_tokens: int = 2000  # Entrada máxima de cada resumo de módulo
+    synthesis_summary_tokens: int = 250  # Tamanho máximo de cada resumo gerado
+    synthesis_reduce_tokens: int = 6000  # Acima disso os resumos são agrupados e resumidos de novo
+
+    # Cache em disco das respostas do LLM (compartilhado entre workers)
+    llm_cache_enabled: bool = True
+    llm_cache_max_bytes: int = 512 * 1024 * 1024
+    llm_cache_max_age_seconds: int = 30 * 24 * 3600
 
     class Config:
         # Construir o caminho absoluto para o arquivo .env
@@ -1,18 +1,21 @@
+import asyncio
+import logging
 import os
-from tree_sitter import Parser
-from tree_sitter_languages import get_language
+from typing import Dict, List
+from app.config import settings
+from app.core_analysis.artifacts import ArtifactStore, get_artifacts
+from app.core_analysis.batching import document_and_scan
+from app.core_analysis.fingerprint import group_duplicates
+from app.core_analysis.languages import display_name, language_for_path
+from app.core_analysis.parsing import extract_units
 from app.core_analysis.state import AgentState, CodeUnit
+from app.core_analysis.unit_index import unit_index
+from app.utils.concurrency import gather_bounded
+from app.utils.metrics import timed_stage
 from app.utils.openai_client import openai_client
+from app.utils.tokens import fit_code
 
-# TODO: Make this language-agnostic
-# Temporarily disabled due to tree-sitter compatibility issues
-# PYTHON_LANGUAGE = get_language('python')
-
-def get_python_parser():
-    # parser = Parser()
-    # parser.set_language(PYTHON_LANGUAGE)
-    # return parser
-    return None  # Temporarily disabled
+logger = logging.getLogger(__name__)
 
 def get_docstring_prompt(language, code):
     return f"""
@@ -27,77 +30,187 @@ def get_docstring_prompt(language, code):
     ```
     """
 
-async def document_code_unit(unit: CodeUnit, language: str) -> str:
-    prompt = get_docstring_prompt(language, unit['raw_code'])
+FAILED_DOCUMENTATION = "Failed to generate documentation."
+
+def is_reusable(unit: dict, documentation) -> bool:
+    """Indexed units are reused only if both documentation and security scan succeeded."""
+    return documentation != FAILED_DOCUMENTATION and unit.get('security_checked', True)
+
+def load_indexed_units(repo_url: str, file_paths: List[str], artifacts: ArtifactStore) -> Dict[str, List[CodeUnit]]:
+    """Indexed units of the given files, with documentation swapped for artifact references.
+
+    Runs in a thread: one batched index query plus artifact writes. Only `from_index`
+    units can be reused as they are; the others only serve as previous versions.
+    """
+    indexed = {}
+    for rel_path, units in unit_index.iter_units(repo_url, file_paths):
+        for unit in units:
+            unit.setdefault('language', language_for_path(rel_path))
+            # Units whose documentation or security scan failed last time are analyzed again
+            documentation = unit.pop('documentation', None)
+            unit['from_index'] = is_reusable(unit, documentation)
+            unit['security_checked'] = unit['from_index']
+            # The index keeps the text; the state only carries the reference
+            artifacts.set_documentation(unit, documentation)
+        indexed[rel_path] = units
+    return indexed
+
+async def document_code_unit(unit: CodeUnit, artifacts: ArtifactStore) -> str:
+    code = fit_code(artifacts.code(unit), unit['unit_type'], settings.unit_max_tokens)
+    prompt = get_docstring_prompt(display_name(unit['language']), code)
     messages = [{"role": "user", "content": prompt}]
     
     try:
         response = await openai_client.create_chat_completion(
-            model="gpt-4o",
+            task="documentation",
+            complexity=unit.get('complexity'),
             messages=messages,
             temperature=0.2,
         )
         return response['choices'][0]['message']['content']
     except Exception as e:
         print(f"Error generating documentation for {unit['unit_name']}: {e}")
-        return "Failed to generate documentation."
+        return FAILED_DOCUMENTATION
 
-async def run(state: AgentState) -> AgentState:
+async def run(state: AgentState) -> dict:
     print("--- Running Deconstructor Agent ---")
+    update = {}
     clone_path = state['clone_path']
-    language = state['language']
-    
-    if language != 'python':
-        print(f"Language '{language}' not supported for deconstruction.")
-        state['code_units'] = []
-        return state
-
-    parser = get_python_parser()
-    if parser is None:
-        print("Parser temporarily disabled due to tree-sitter compatibility issues.")
-        state['code_units'] = []
-        state['processing_log'] = ["Deconstructor temporarily disabled"]
-        return state
-        
-    code_units = []
-
-    for root, _, files in os.walk(clone_path):
-        for file in files:
-            if file.endswith('.py'):
-                file_path = os.path.join(root, file)
-                with open(file_path, 'r') as f:
-                    code = f.read()
-                
-                tree = parser.parse(bytes(code, "utf8"))
-                
-                # Query for functions and classes
-                query_str = """
-                (function_definition
-                  name: (identifier) @function.name)
-                (class_definition
-                  name: (identifier) @class.name)
-                """
-                query = PYTHON_LANGUAGE.query(query_str)
-                captures = query.captures(tree.root_node)
-
-                for node, capture_name in captures:
-                    unit_type = 'function' if 'function' in capture_name else 'class'
-                    unit_name = node.text.decode('utf8')
-                    raw_code = node.parent.text.decode('utf8')
-                    
-                    code_unit = CodeUnit(
-                        file_path=file_path,
-                        unit_name=unit_name,
-                        unit_type=unit_type,
-                        raw_code=raw_code,
-                        documentation=None,
-                        vulnerabilities=[]
-                    )
-                    
-                    documentation = await document_code_unit(code_unit, language)
-                    code_unit['documentation'] = documentation
-                    code_units.append(code_unit)
-
-    state['code_units'] = code_units
-    state['processing_log'] = [f"Deconstructed and documented {len(code_units)} code units."]
-    return state
\ No newline at end of file
+    artifacts = get_artifacts(state)
+
+    repo_url = state['repo_url']
+    changed_files = state.get('changed_files') if settings.incremental_analysis else None
+    changed = set(changed_files) if changed_files is not None else None
+    indexed_hashes = await asyncio.to_thread(unit_index.get_file_hashes, repo_url) if settings.incremental_analysis else {}
+
+    # Languages are dispatched per file, so polyglot repos are covered in one pass.
+    # The manifest already excludes ignored trees; binary and generated files are not documented.
+    entries = [
+        entry for entry in state['manifest']
+        if not entry['binary'] and not entry['generated'] and language_for_path(entry['path'])
+    ]
+    # SQLite, JSON decoding and artifact writes stay off the event loop shared by other jobs
+    indexed_units = await asyncio.to_thread(
+        load_indexed_units, repo_url, [entry['path'] for entry in entries if entry['path'] in indexed_hashes], artifacts
+    )
+
+    file_units = {}  # rel_path -> units, in walk order
+    file_hashes = {}
+    to_parse = []
+    for entry in entries:
+        rel_path = entry['path']
+        units = indexed_units.get(rel_path)
+        # Indexed before byte ranges existed: the file is parsed again, reusing the documentation
+        indexed = units is not None and all('start_byte' in unit for unit in units)
+
+        # Untouched by the push: reuse the indexed units
+        if indexed and changed is not None and rel_path not in changed:
+            file_units[rel_path] = units
+            file_hashes[rel_path] = indexed_hashes[rel_path]
+            continue
+
+        # The blob SHA identifies the content, so unchanged files are never read
+        file_hashes[rel_path] = entry['blob_sha']
+        if indexed and indexed_hashes[rel_path] == entry['blob_sha']:
+            file_units[rel_path] = units
+            continue
+
+        file_units[rel_path] = None
+        to_parse.append((rel_path, os.path.join(clone_path, rel_path)))
+
+    # CPU-bound parsing runs in the process pool, off the event loop
+    with timed_stage("parse"):
+        records = await extract_units(to_parse)
+    for record in records:
+        rel_path = record['file_path']
+        if record['error']:
+            logger.warning("Error parsing %s: %s", rel_path, record['error'])
+            # Without a hash the file is left out of the index and parsed again on the next run
+            file_hashes.pop(rel_path, None)
+
+        previous_units = {
+            (unit['unit_name'], unit['code_hash']): unit
+            for unit in indexed_units.get(rel_path, [])
+        }
+
+        units = []
+        for parsed in record['units']:
+            previous = previous_units.get((parsed['unit_name'], parsed['code_hash']))
+            if previous and not previous['from_index']:
+                previous = None
+
+            unit = CodeUnit(
+                file_path=rel_path,
+                language=record['language'],
+                unit_name=parsed['unit_name'],
+                unit_type=parsed['unit_type'],
+                start_byte=parsed['start_byte'],
+                end_byte=parsed['end_byte'],
+                decorator_start_byte=parsed['decorator_start_byte'],
+                code_hash=parsed['code_hash'],
+                fingerprint=parsed['fingerprint'],
+                complexity=parsed['complexity'],
+                vulnerabilities=previous['vulnerabilities'] if previous else [],
+                from_index=previous is not None,
+                security_checked=previous is not None,
+                documentation_ref=previous['documentation_ref'] if previous else None,
+            )
+            units.append(unit)
+        file_units[rel_path] = units
+
+    code_units = [unit for units in file_units.values() for unit in units]
+
+    pending_units = [unit for unit in code_units if not unit['from_index']]
+    reused = 0
+    if settings.fingerprint_store_enabled and pending_units:
+        # Copies of code already analyzed in this or any other repository skip the LLM
+        stored = await asyncio.to_thread(
+            unit_index.get_by_fingerprints, [unit['fingerprint'] for unit in pending_units if unit.get('fingerprint')]
+        )
+        matches = [(unit, stored[unit['fingerprint']]) for unit in pending_units if unit.get('fingerprint') in stored]
+
+        def reuse_stored():
+            for unit, entry in matches:
+                artifacts.set_documentation(unit, entry['documentation'])
+                unit['vulnerabilities'] = entry['vulnerabilities']
+                unit['from_index'] = True
+                unit['security_checked'] = True
+
+        # Writing the reused texts is file I/O, kept off the event loop like the index queries
+        await asyncio.to_thread(reuse_stored)
+        reused = len(matches)
+        pending_units = [unit for unit in pending_units if not unit['from_index']]
+
+    # Duplicates within the job are sent once and share the result
+    groups = group_duplicates(pending_units)
+    representatives = [group[0] for group in groups]
+    if settings.llm_batch_mode:
+        # Small units share one combined documentation + SAST request
+        await document_and_scan(
+            representatives, state['framework'], artifacts,
+            lambda unit: document_code_unit(unit, artifacts), FAILED_DOCUMENTATION,
+        )
+    else:
+        documentations = await gather_bounded(
+            lambda unit: document_code_unit(unit, artifacts),
+            representatives,
+            limit=settings.llm_max_concurrency,
+            on_error=lambda unit, e: FAILED_DOCUMENTATION,
+        )
+        for code_unit, documentation in zip(representatives, documentations):
+            artifacts.set_documentation(code_unit, documentation)
+
+    for representative, *duplicates in groups:
+        for duplicate in duplicates:
+            duplicate['documentation_ref'] = representative['documentation_ref']
+            if representative['security_checked']:
+                duplicate['vulnerabilities'] = list(representative['vulnerabilities'])
+                duplicate['security_checked'] = True
+
+    update['code_units'] = code_units
+    update['file_hashes'] = file_hashes
+    update['processing_log'] = [
+        f"Deconstructed {len(code_units)} code units, documented {len(representatives)} new or modified "
+        f"({len(pending_units) - len(representatives)} duplicates, {reused} reused from equivalent units)."
+    ]
+    return update
\ No newline at end of file
@@ -1,21 +1,27 @@
 import os
 import json
+from app.config import settings
 from app.core_analysis.state import AgentState, DocumentationScore
 from app.utils.openai_client import openai_client
+from app.utils.tokens import condense_markdown
 
-async def run(state: AgentState) -> AgentState:
+async def run(state: AgentState) -> dict:
     print("--- Running Evaluator Agent ---")
+    update = {}
     clone_path = state['clone_path']
     
     readme_path = os.path.join(clone_path, 'README.md')
-    if not os.path.exists(readme_path):
-        state['existing_doc_score'] = DocumentationScore(score=0.0, reasoning="No README.md file found.")
-        state['processing_log'] = ["No README.md file found."]
-        return state
+    if not any(entry['path'] == 'README.md' for entry in state['manifest']):
+        update['existing_doc_score'] = DocumentationScore(score=0.0, reasoning="No README.md file found.")
+        update['processing_log'] = ["No README.md file found."]
+        return update
 
     with open(readme_path, 'r') as f:
         readme_content = f.read()
 
+    # Huge READMEs keep every heading and the start of each section
+    readme_content = condense_markdown(readme_content, settings.readme_max_tokens)
+
     prompt = f"""
     You are a senior software architect tasked with evaluating the quality of a project's documentation.
     Evaluate the following text based strictly on the following rubric:
@@ -41,7 +47,7 @@ async def run(state: AgentState) -> AgentState:
     
     try:
         response = await openai_client.create_chat_completion(
-            model="gpt-4o",
+            task="readme_evaluation",
             messages=messages,
             temperature=0.2,
         )
@@ -49,15 +55,15 @@ async def run(state: AgentState) -> AgentState:
         response_text = response['choices'][0]['message']['content']
         score_data = json.loads(response_text)
         
-        state['existing_doc_score'] = DocumentationScore(
+        update['existing_doc_score'] = DocumentationScore(
             score=score_data['score'],
             reasoning=score_data['reasoning']
         )
-        state['processing_log'] = [f"Documentation evaluated with score: {score_data['score']}"]
+        update['processing_log'] = [f"Documentation evaluated with score: {score_data['score']}"]
 
     except Exception as e:
         print(f"Error evaluating documentation: {e}")
-        state['error'] = str(e)
-        state['processing_log'] = [f"Failed to evaluate documentation: {e}"]
+        update['error'] = str(e)
+        update['processing_log'] = [f"Failed to evaluate documentation: {e}"]
 
-    return state
+    return update
@@ -1,55 +1,130 @@
+import asyncio
+import json
 from git import Repo
+from app.config import settings
 from app.core_analysis.state import AgentState, CommitInfo
+from app.core_analysis.unit_index import unit_index
+from app.utils.metrics import timed_stage
 from app.utils.openai_client import openai_client
+from app.utils.tokens import truncate_to_tokens
 
-def get_commit_summary_prompt(message):
+FAILED_SUMMARY = "Failed to summarize commit."
+RECORD_SEPARATOR = "\x1e"
+FIELD_SEPARATOR = "\x1f"
+
+def read_commit_log(repo: Repo, window: int):
+    """Commits mais recentes a partir do HEAD com as estatísticas de `git log --numstat`, sem ler diffs."""
+    output = repo.git.log(
+        f"-{window}",
+        "--numstat",
+        "--no-renames",
+        f"--format={RECORD_SEPARATOR}%H{FIELD_SEPARATOR}%an{FIELD_SEPARATOR}%B{FIELD_SEPARATOR}",
+        "HEAD",
+    )
+    commits = []
+    for record in output.split(RECORD_SEPARATOR)[1:]:
+        commit_hash, author, message, numstat = record.split(FIELD_SEPARATOR, 3)
+        files = []
+        insertions = deletions = 0
+        for line in numstat.strip().splitlines():
+            added, removed, path = line.split("\t", 2)
+            # Binary files report '-' for both counts
+            insertions += int(added) if added.isdigit() else 0
+            deletions += int(removed) if removed.isdigit() else 0
+            files.append(path)
+        commits.append({
+            "hash": commit_hash,
+            "author": author,
+            "message": message.strip(),
+            "files": files,
+            "insertions": insertions,
+            "deletions": deletions,
+        })
+    return commits
+
+def get_commit_summary_prompt(commits):
+    sections = "\n".join(
+        f"""
+    ### COMMIT {index}
+    Message: {truncate_to_tokens(commit['message'], 300)}
+    Changed files ({len(commit['files'])}, +{commit['insertions']}/-{commit['deletions']} lines): {', '.join(commit['files'][:15])}{' ...' if len(commit['files']) > 15 else ''}"""
+        for index, commit in enumerate(commits)
+    )
     return f"""
-    Summarize the purpose of the following commit message in a single concise sentence:
+    Summarize the purpose of EACH of the following commits in a single concise sentence, using its message and the files it changed.
+
+    Respond ONLY with a JSON object in the following format, with one entry per commit:
+    {{"commits": [{{"id": <commit_number>, "summary": "<sentence>"}}]}}
 
-    "{message}"
+    COMMITS:
+    {sections}
     """
 
-async def summarize_commit(commit):
-    prompt = get_commit_summary_prompt(commit.message)
+async def summarize_commits(commits):
+    """Resume todos os commits em uma única requisição; devolve {hash: resumo} dos que vieram na resposta."""
+    prompt = get_commit_summary_prompt(commits)
     messages = [{"role": "user", "content": prompt}]
-    
+
     try:
         response = await openai_client.create_chat_completion(
-            model="gpt-4o",
+            task="commit_summary",
             messages=messages,
             temperature=0.2,
-            max_tokens=100,
+            max_tokens=min(4096, 80 * len(commits) + 50),
         )
-        return response['choices'][0]['message']['content']
+        data = json.loads(response['choices'][0]['message']['content'])
     except Exception as e:
-        print(f"Error summarizing commit {commit.hexsha}: {e}")
-        return "Failed to summarize commit."
+        print(f"Error summarizing {len(commits)} commits: {e}")
+        return {}
+
+    summaries = {}
+    for entry in data.get('commits', []):
+        index = entry.get('id')
+        if isinstance(index, int) and 0 <= index < len(commits) and entry.get('summary'):
+            summaries[commits[index]['hash']] = str(entry['summary'])
+    return summaries
 
-async def run(state: AgentState) -> AgentState:
+async def run(state: AgentState) -> dict:
     print("--- Running Evolution Agent ---")
+    update = {}
     clone_path = state['clone_path']
-    
+
     try:
+        # The worktree is detached at the analyzed commit of the default branch, so HEAD
+        # works for 'main', 'master' or any other default branch name
         repo = Repo(clone_path)
-        commits = list(repo.iter_commits('main', max_count=4))
-        
-        commit_analysis = []
-        for commit in commits:
-            summary = await summarize_commit(commit)
-            commit_info = CommitInfo(
-                hash=commit.hexsha,
-                author=commit.author.name,
-                message=commit.message,
-                summary_of_changes=summary,
+        with timed_stage("git_log"):
+            commits = read_commit_log(repo, settings.evolution_commit_window)
+
+        # Commits are immutable: only ones never summarized before reach the LLM
+        summaries = await asyncio.to_thread(unit_index.get_commit_summaries, [commit['hash'] for commit in commits])
+        new_commits = [commit for commit in commits if commit['hash'] not in summaries]
+        new_summaries = {}
+        if new_commits:
+            new_summaries = await summarize_commits(new_commits)
+            if new_summaries:
+                await asyncio.to_thread(unit_index.put_commit_summaries, new_summaries)
+            summaries.update(new_summaries)
+
+        commit_analysis = [
+            CommitInfo(
+                hash=commit['hash'],
+                author=commit['author'],
+                message=commit['message'],
+                summary_of_changes=summaries.get(commit['hash'], FAILED_SUMMARY),
+                files_changed=len(commit['files']),
+                insertions=commit['insertions'],
+                deletions=commit['deletions'],
             )
-            commit_analysis.append(commit_info)
-            
-        state['commit_analysis'] = commit_analysis
-        state['processing_log'] = [f"Analyzed {len(commits)} recent commits."]
+            for commit in commits
+        ]
+
+        update['commit_analysis'] = commit_analysis
+        update['processing_log'] = [f"Analyzed {len(commits)} recent commits ({len(new_summaries)} of {len(new_commits)} new ones summarized)."]
 
     except Exception as e:
         print(f"Error analyzing commits: {e}")
-        state['error'] = str(e)
-        state['processing_log'] = [f"Failed to analyze commits: {e}"]
+        update['error'] = str(e)
+        update['processing_log'] = [f"Failed to analyze commits: {e}"]
 
-    return state
+    return update
@@ -0,0 +1,133 @@
+import asyncio
+import fnmatch
+import hashlib
+import os
+import tempfile
+from git import Repo
+from app.config import settings
+from app.core_analysis.state import AgentState, FileEntry
+from app.utils.metrics import timed_stage
+
+# Bytes read from the start of each file to classify it (same heuristic as git's binary check)
+SNIFF_BYTES = 8000
+
+GENERATED_PATTERNS = (
+    '*.min.js', '*.min.css', '*.map', '*.pb.go', '*_pb2.py', '*_pb2_grpc.py', '*.g.dart', '*.designer.cs',
+    'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml', 'poetry.lock', 'Pipfile.lock', 'Cargo.lock', 'go.sum',
+)
+GENERATED_MARKERS = (b'@generated', b'DO NOT EDIT', b'Code generated by', b'Autogenerated', b'auto-generated')
+COMMENT_PREFIXES = (b'#', b'//', b'/*', b'*', b'<!--', b'--', b';')
+
+
+def git_blob_sha(data: bytes) -> str:
+    """SHA do blob como o git calcularia (`git hash-object`), para arquivos fora do índice."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def tracked_blobs(repo: Repo) -> dict:
+    """Caminho relativo -> SHA do blob de todos os arquivos do índice (`git ls-files -s`)."""
+    blobs = {}
+    for record in repo.git.ls_files('-s', '-z').split('\0'):
+        if record:
+            info, path = record.split('\t', 1)
+            blobs[path] = info.split()[1]
+    return blobs
+
+
+def ignored_paths(repo: Repo, paths: list) -> set:
+    """Caminhos (fora do índice) excluídos pelo .gitignore, em uma chamada de `git check-ignore`.
+
+    Os caminhos vão pela entrada padrão, separados por NUL: como argumentos, uma
+    árvore grande fora do índice estouraria o limite da linha de comando (E2BIG).
+    """
+    if not paths:
+        return set()
+    with tempfile.TemporaryFile() as stdin:
+        stdin.write(b'\0'.join(path.encode('utf8', errors='surrogateescape') for path in paths) + b'\0')
+        stdin.seek(0)
+        # check-ignore exits with 1 when nothing matches
+        output = repo.git.check_ignore('--stdin', '-z', istream=stdin, with_exceptions=False)
+    return {path.rstrip('/') for path in output.split('\0') if path}
+
+
+def classify(rel_path: str, head: bytes):
+    """(binary, generated) a partir do nome e dos primeiros bytes do arquivo."""
+    binary = b'\0' in head
+    name = os.path.basename(rel_path)
+    generated = any(fnmatch.fnmatch(name, pattern) for pattern in GENERATED_PATTERNS)
+    if not generated and not binary:
+        # Generators announce themselves in a comment at the top of the file
+        generated = any(
+            line.lstrip().startswith(COMMENT_PREFIXES) and any(marker in line for marker in GENERATED_MARKERS)
+            for line in head[:1024].splitlines()[:5]
+        )
+    return binary, generated
+
+
+def build_manifest(clone_path: str) -> list:
+    """Percorre o worktree uma única vez com `os.scandir`, pulando os diretórios ignorados."""
+    repo = Repo(clone_path)
+    blobs = tracked_blobs(repo)
+    tracked_dirs = {os.path.dirname(path) for path in blobs}
+    for directory in list(tracked_dirs):
+        while directory:
+            directory = os.path.dirname(directory)
+            tracked_dirs.add(directory)
+    ignored_dirs = set(settings.manifest_ignored_dirs)
+
+    manifest = []
+    pending = ['']
+    while pending:
+        rel_dir = pending.pop()
+        dirs, files = [], []
+        with os.scandir(os.path.join(clone_path, rel_dir)) as entries:
+            for entry in entries:
+                # Symlinks may point outside the worktree
+                if entry.is_symlink() or entry.name in ignored_dirs:
+                    continue
+                rel_path = os.path.join(rel_dir, entry.name)
+                if entry.is_dir():
+                    dirs.append(rel_path)
+                elif entry.is_file():
+                    files.append((rel_path, entry.stat().st_size))
+
+        # Tracked paths are never ignored; only untracked leftovers are checked against .gitignore
+        ignored = ignored_paths(
+            repo,
+            [path for path in dirs if path not in tracked_dirs] + [path for path, _ in files if path not in blobs],
+        )
+        pending.extend(sorted((path for path in dirs if path not in ignored), reverse=True))
+
+        for rel_path, size in sorted(files):
+            if rel_path in ignored:
+                continue
+            with open(os.path.join(clone_path, rel_path), 'rb') as f:
+                data = f.read(SNIFF_BYTES) if rel_path in blobs else f.read()
+            binary, generated = classify(rel_path, data[:SNIFF_BYTES])
+            manifest.append(FileEntry(
+                path=rel_path,
+                size=size,
+                extension=os.path.splitext(rel_path)[1].lower(),
+                blob_sha=blobs.get(rel_path) or git_blob_sha(data),
+                binary=binary,
+                generated=generated,
+            ))
+    return manifest
+
+
+async def run(state: AgentState) -> dict:
+    print("--- Running Manifest Agent ---")
+    update = {}
+    if not state.get('clone_path'):
+        # Repo("") would resolve to the process cwd and scan the wrong repository
+        update['error'] = "No worktree to scan: the checkout did not complete."
+        return update
+
+    with timed_stage("scan"):
+        manifest = await asyncio.to_thread(build_manifest, state['clone_path'])
+
+    update['manifest'] = manifest
+    update['processing_log'] = [
+        f"Indexed {len(manifest)} files ({sum(1 for entry in manifest if entry['binary'] or entry['generated'])} binary or generated)."
+    ]
+    return update
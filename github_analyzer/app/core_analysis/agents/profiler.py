@@ -2,14 +2,16 @@ import os
 import json
 from app.core_analysis.state import AgentState
 
-async def run(state: AgentState) -> AgentState:
+async def run(state: AgentState) -> dict:
     print("--- Running Profiler Agent ---")
+    update = {}
     clone_path = state['clone_path']
+    paths = {entry['path'] for entry in state['manifest']}
     language = "Unknown"
     framework = "Unknown"
 
     # Python
-    if os.path.exists(os.path.join(clone_path, 'requirements.txt')):
+    if 'requirements.txt' in paths:
         language = 'python'
         with open(os.path.join(clone_path, 'requirements.txt'), 'r') as f:
             content = f.read()
@@ -19,7 +21,7 @@ async def run(state: AgentState) -> AgentState:
                 framework = 'django'
     
     # Node.js
-    elif os.path.exists(os.path.join(clone_path, 'package.json')):
+    elif 'package.json' in paths:
         language = 'javascript'
         with open(os.path.join(clone_path, 'package.json'), 'r') as f:
             data = json.load(f)
@@ -30,15 +32,15 @@ async def run(state: AgentState) -> AgentState:
                 framework = 'express'
 
     # Java
-    elif os.path.exists(os.path.join(clone_path, 'pom.xml')):
+    elif 'pom.xml' in paths:
         language = 'java'
         with open(os.path.join(clone_path, 'pom.xml'), 'r') as f:
             content = f.read()
             if 'spring-boot' in content:
                 framework = 'spring-boot'
 
-    state['language'] = language
-    state['framework'] = framework
-    state['processing_log'] = [f"Detected language: {language}, framework: {framework}"]
+    update['language'] = language
+    update['framework'] = framework
+    update['processing_log'] = [f"Detected language: {language}, framework: {framework}"]
     
-    return state
+    return update
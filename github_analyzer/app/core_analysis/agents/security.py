@@ -1,6 +1,17 @@
+import asyncio
 import json
+from app.config import settings
+from app.core_analysis.agents.deconstructor import FAILED_DOCUMENTATION
+from app.core_analysis.artifacts import ArtifactStore, get_artifacts
+from app.core_analysis.fingerprint import group_duplicates
+from app.core_analysis.languages import display_name
+from app.core_analysis.sast import import_aliases, merge_findings, needs_review, scan_unit
 from app.core_analysis.state import AgentState, Vulnerability
+from app.core_analysis.unit_index import unit_index
+from app.utils.concurrency import gather_bounded
+from app.utils.metrics import timed_stage
 from app.utils.openai_client import openai_client
+from app.utils.tokens import count_tokens, outline_code, split_code
 
 def get_sast_prompt(language, framework, code):
     return f"""
@@ -19,13 +30,17 @@ def get_sast_prompt(language, framework, code):
     ```
     """
 
-async def analyze_code_unit_for_vulnerabilities(unit, language, framework):
-    prompt = get_sast_prompt(language, framework, unit['raw_code'])
+# Result of a scan that did not complete; unlike [] it does not mean "no vulnerabilities"
+FAILED_SCAN = None
+
+async def analyze_code_chunk(code, language, framework, unit_name, complexity=None):
+    prompt = get_sast_prompt(language, framework, code)
     messages = [{"role": "user", "content": prompt}]
     
     try:
         response = await openai_client.create_chat_completion(
-            model="gpt-4o",
+            task="security",
+            complexity=complexity,
             messages=messages,
             temperature=0.2,
         )
@@ -35,16 +50,105 @@ async def analyze_code_unit_for_vulnerabilities(unit, language, framework):
         
         return [Vulnerability(**vuln) for vuln in vulnerabilities_data]
     except Exception as e:
-        print(f"Error analyzing {unit['unit_name']} for vulnerabilities: {e}")
-        return []
+        print(f"Error analyzing {unit_name} for vulnerabilities: {e}")
+        return FAILED_SCAN
+
+async def analyze_code_unit_for_vulnerabilities(unit, language, framework, artifacts: ArtifactStore):
+    language = display_name(unit.get('language', language))
+    code = artifacts.code(unit)
+    # Methods are scanned as their own units, so an oversized class only needs its outline
+    if unit['unit_type'] == 'class' and count_tokens(code) > settings.unit_max_tokens:
+        code = outline_code(code)
+    # Route decorators tell the LLM which parameters come from the request
+    code = artifacts.decorators(unit) + code
+
+    vulnerabilities = []
+    for chunk in split_code(code, settings.unit_max_tokens):
+        found = await analyze_code_chunk(chunk, language, framework, unit['unit_name'], unit.get('complexity'))
+        if found is FAILED_SCAN:
+            # A partially scanned unit is not a clean one
+            return FAILED_SCAN
+        vulnerabilities.extend(found)
+    return vulnerabilities
+
+def prefilter(units, artifacts: ArtifactStore):
+    """Aplica as regras locais; devolve as unidades que precisam do LLM com seus achados preliminares."""
+    escalated = []
+    file_aliases = {}
+    for unit in units:
+        code = artifacts.code(unit)
+        aliases = None
+        if unit.get('language') == 'python':
+            # Sinks imported by name or under an alias (`from subprocess import run`) are resolved per file
+            if unit['file_path'] not in file_aliases:
+                file_aliases[unit['file_path']] = import_aliases(artifacts.file_text(unit['file_path']))
+            aliases = file_aliases[unit['file_path']]
+        findings = scan_unit(unit, code, aliases)
+        if unit.get('security_checked'):
+            # Scanned in a combined batch: rule hits are kept next to the LLM's findings
+            unit['vulnerabilities'] = merge_findings(findings, unit['vulnerabilities'])
+        elif needs_review(unit, code, findings, artifacts.decorators(unit)):
+            escalated.append((unit, findings))
+        else:
+            unit['vulnerabilities'] = []
+            unit['security_checked'] = True
+    return escalated
 
-async def run(state: AgentState) -> AgentState:
+async def run(state: AgentState) -> dict:
     print("--- Running Security Agent ---")
+    update = {}
     language = state['language']
     framework = state['framework']
+    artifacts = get_artifacts(state)
     
-    for unit in state['code_units']:
-        unit['vulnerabilities'] = await analyze_code_unit_for_vulnerabilities(unit, language, framework)
+    code_units = state['code_units']
+    new_units = [unit for unit in code_units if not unit.get('from_index')]
+    if settings.sast_prefilter:
+        # Only units with rule hits or untrusted input reach the LLM
+        with timed_stage("prefilter"):
+            escalated = await asyncio.to_thread(prefilter, new_units, artifacts)
+    else:
+        # Units reused from the index or scanned in a combined batch already carry their vulnerabilities
+        escalated = [(unit, []) for unit in new_units if not unit.get('security_checked')]
+
+    # Equivalent units are reviewed once
+    groups = group_duplicates([unit for unit, _ in escalated])
+    results = await gather_bounded(
+        lambda group: analyze_code_unit_for_vulnerabilities(group[0], language, framework, artifacts),
+        groups,
+        limit=settings.llm_max_concurrency,
+        on_error=lambda group, e: FAILED_SCAN,
+    )
+    reviewed = {id(unit): vulnerabilities for group, vulnerabilities in zip(groups, results) for unit in group}
+    failed = 0
+    for unit, findings in escalated:
+        if reviewed[id(unit)] is FAILED_SCAN:
+            # Rule hits are still reported; security_checked stays False so the unit is scanned again
+            unit['vulnerabilities'] = findings
+            failed += 1
+            continue
+        unit['vulnerabilities'] = merge_findings(findings, list(reviewed[id(unit)]))
+        unit['security_checked'] = True
+
+    # The persistent index stores documentation text, not job-local references; records are
+    # materialized one at a time as the index consumes them, so only one file's texts are in memory
+    if settings.incremental_analysis and state.get('file_hashes'):
+        records = (artifacts.materialize(unit) for unit in code_units)
+        await asyncio.to_thread(unit_index.replace, state['repo_url'], state['commit_hash'], state['file_hashes'], records)
+    if settings.fingerprint_store_enabled:
+        # Failed documentation or scans are not shared: other repositories would reuse them as final
+        analyzed = (
+            record for record in (
+                artifacts.materialize(unit) for unit in new_units
+                if unit.get('fingerprint') and unit['security_checked']
+            )
+            if record['documentation'] != FAILED_DOCUMENTATION
+        )
+        await asyncio.to_thread(unit_index.put_fingerprints, analyzed)
 
-    state['processing_log'] = ["Security analysis completed."]
-    return state
+    update['code_units'] = code_units
+    failures = f", {failed} failed and will be retried" if failed else ""
+    update['processing_log'] = [
+        f"Security analysis completed for {len(new_units)} new or modified units ({len(groups)} reviewed by the LLM{failures})."
+    ]
+    return update
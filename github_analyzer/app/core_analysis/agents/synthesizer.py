@@ -1,81 +1,165 @@
-import json
 from datetime import datetime
+from typing import List
+from langgraph.config import get_stream_writer
+from app.config import settings
+from app.core_analysis.artifacts import get_artifacts
+from app.core_analysis.report import (
+    group_by_module,
+    module_digest,
+    render_commit_timeline,
+    render_documentation,
+    render_documentation_score,
+    render_header,
+    render_vulnerability_table,
+    severity_counts,
+)
 from app.core_analysis.state import AgentState
+from app.utils.concurrency import gather_bounded
 from app.utils.openai_client import openai_client
+from app.utils.tokens import count_tokens
 
-def get_master_prompt(state: AgentState):
-    repo_name = state['repo_url'].split('/')[-1].replace('.git', '')
-    
-    # Prepare data for the prompt
-    data = {
-        "repo_name": repo_name,
-        "language": state['language'],
-        "framework": state['framework'],
-        "existing_doc_score": state.get('existing_doc_score'),
-        "commit_analysis": state.get('commit_analysis', []),
-        "code_units": state.get('code_units', [])
-    }
-    
+def get_module_summary_prompt(module, language, digest):
     return f"""
-    You are an expert technical writer and software quality analyst. Your task is to generate a comprehensive and professional project analysis report in Markdown format, based on the provided JSON data. Strictly follow the structure of the Markdown template below, filling in the placeholders with the information from the JSON.
-
-    **ANALYSIS DATA (JSON):**
-    ```json
-    {json.dumps(data, indent=2)}
-    ```
+    You are an expert software architect. Below is the list of functions and classes of the module `{module}`
+    of a {language} project, each with the first line of its documentation.
+    Write a concise summary (at most 4 sentences) of the module's responsibility and its main components.
 
-    **MARKDOWN TEMPLATE (USE THIS STRUCTURE):**
+    MODULE CONTENTS:
+    {digest}
+    """
 
-    # Intelligent Analysis Report for: {data['repo_name']}
+def get_merge_prompt(summaries):
+    joined = "\n\n".join(summaries)
+    return f"""
+    Merge the following module summaries of the same project into one concise summary
+    (at most 6 sentences) that preserves the most important responsibilities and components.
 
-    ## 1. Project Overview
-    - **Primary Language:** {data['language']}
-    - **Detected Framework:** {data['framework']}
+    SUMMARIES:
+    {joined}
+    """
 
-    ## 2. Existing Documentation Analysis
-    - **Quality Score:** {data['existing_doc_score']['score']:.2f} / 1.0
-    - **AI Analyst Evaluation:** {data['existing_doc_score']['reasoning']}
+def get_overview_prompt(state: AgentState, repo_name, summaries, severities):
+    joined = "\n\n".join(summaries)
+    vulnerabilities = ", ".join(f"{count} {severity}" for severity, count in severities.items()) or "none"
+    commits = "\n".join(f"- {commit['summary_of_changes']}" for commit in state.get('commit_analysis', []))
+    return f"""
+    You are an expert technical writer and software quality analyst. Write the executive summary section
+    of an analysis report for the project "{repo_name}" ({state['language']}, {state['framework']}) in Markdown.
+    Describe what the project does, how it is organized and the most relevant quality and security observations.
+    Do not add headings above level 3 and do not repeat the raw data verbatim.
 
-    ## 3. Security Analysis Report (SAST)
-    The static analysis identified the following potential vulnerabilities. Manual review is recommended.
+    MODULE SUMMARIES:
+    {joined}
 
-    | Severity | CWE | Description | Location |
-    |----------|-----|-------------|----------|
-    {''.join([f'| {vuln["severity"]} | {vuln["cwe"]} | {vuln["description"]} | {unit["unit_name"]} in {unit["file_path"]} |\n' for unit in data['code_units'] for vuln in unit['vulnerabilities']])}
+    POTENTIAL VULNERABILITIES BY SEVERITY: {vulnerabilities}
 
-    ## 4. AI-Generated Code Documentation
-    Below is detailed documentation for the functions and classes identified in the project.
+    RECENT CHANGES:
+    {commits}
+    """
 
-    {''.join([f'### {unit["unit_name"]}\n**Location:** `{unit["file_path"]}`\n```markdown\n{unit["documentation"]}\n```\n' for unit in data['code_units']])}
+async def complete(prompt: str, max_tokens: int, task: str) -> str:
+    response = await openai_client.create_chat_completion(
+        task=task,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        max_tokens=max_tokens,
+    )
+    return response['choices'][0]['message']['content']
 
-    ## 5. Recent Project Evolution
-    Analysis of the 4 most recent commits:
-    {''.join([f'- **Commit `{commit["hash"][:7]}` by {commit["author"]}:** {commit["summary_of_changes"]}\n' for commit in data['commit_analysis']])}
+def pack_summaries(summaries: List[str], budget_tokens: int) -> List[List[str]]:
+    groups, current, current_tokens = [], [], 0
+    for summary in summaries:
+        tokens = count_tokens(summary)
+        if current and current_tokens + tokens > budget_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
 
-    ---
-    *Report automatically generated on {datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")} UTC.*
-    """
+async def reduce_summaries(summaries: List[str]) -> List[str]:
+    """Merges summaries level by level until they fit the overview prompt."""
+    while len(summaries) > 1 and count_tokens("\n\n".join(summaries)) > settings.synthesis_reduce_tokens:
+        groups = pack_summaries(summaries, settings.synthesis_reduce_tokens // 2)
+        if len(groups) == len(summaries):
+            # Every summary fills a group on its own; pair them up so each level still shrinks
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+        summaries = await gather_bounded(
+            lambda group: complete(get_merge_prompt(group), settings.synthesis_summary_tokens, "summary_merge"),
+            groups,
+            limit=settings.llm_max_concurrency,
+            on_error=lambda group, e: "\n\n".join(group),
+        )
+    return summaries
 
-async def run(state: AgentState) -> AgentState:
+async def run(state: AgentState) -> dict:
     print("---" + " Running Synthesizer Agent ---")
-    
-    prompt = get_master_prompt(state)
-    messages = [{"role": "user", "content": prompt}]
-    
+    update = {}
+    repo_name = state['repo_url'].split('/')[-1].replace('.git', '')
+    code_units = state.get('code_units', [])
+    artifacts = get_artifacts(state)
+    writer = get_stream_writer()
+
     try:
-        response = await openai_client.create_chat_completion(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.2,
-            max_tokens=4000,
+        # Map: one compact summary per module, built from unit names and doc headlines only
+        modules = list(group_by_module(code_units).items())
+
+        async def summarize_module(item):
+            module, units = item
+            digest = module_digest(units, artifacts, settings.synthesis_module_digest_tokens)
+            prompt = get_module_summary_prompt(module, state['language'], digest)
+            return await complete(prompt, settings.synthesis_summary_tokens, "module_summary")
+
+        def on_module_error(item, e):
+            print(f"Error summarizing module {item[0]}: {e}")
+            return ""
+
+        module_summaries = await gather_bounded(
+            summarize_module,
+            modules,
+            limit=settings.llm_max_concurrency,
+            on_error=on_module_error,
         )
-        
-        state['final_report'] = response['choices'][0]['message']['content']
-        state['processing_log'] = ["Final report generated."]
+        summaries_by_module = {module: summary for (module, _), summary in zip(modules, module_summaries)}
+
+        # Reduce: only the summaries reach the overview prompt, so its size is bounded
+        summaries = await reduce_summaries([
+            f"Module `{module}`: {summary}" for module, summary in summaries_by_module.items() if summary
+        ])
+        severities = severity_counts(code_units)
+
+        # Sections that need no LLM are rendered locally; the overview is streamed in between
+        parts = [render_header(repo_name, state['language'], state['framework']), "### Executive Summary\n"]
+        writer({"type": "report_token", "text": "".join(parts)})
+        async for delta in openai_client.stream_chat_completion(
+            task="synthesis",
+            messages=[{"role": "user", "content": get_overview_prompt(state, repo_name, summaries, severities)}],
+            temperature=0.2,
+            max_tokens=1000,
+        ):
+            parts.append(delta)
+            writer({"type": "report_token", "text": delta})
+
+        sections = [
+            "\n\n",
+            render_documentation_score(state.get('existing_doc_score')),
+            render_vulnerability_table(code_units),
+            render_documentation(code_units, artifacts, summaries_by_module),
+            render_commit_timeline(state.get('commit_analysis', [])),
+            f"---\n*Report automatically generated on {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC.*\n",
+        ]
+        for section in sections:
+            parts.append(section)
+            writer({"type": "report_token", "text": section})
+
+        update['final_report'] = "".join(parts)
+        update['processing_log'] = [f"Final report generated from {len(modules)} module summaries."]
 
     except Exception as e:
         print(f"Error generating final report: {e}")
-        state['error'] = str(e)
-        state['processing_log'] = [f"Failed to generate final report: {e}"]
+        update['error'] = str(e)
+        update['processing_log'] = [f"Failed to generate final report: {e}"]
 
-    return state
+    return update
@@ -1,31 +1,48 @@
-import os
-import shutil
+import asyncio
 from git import Repo, GitCommandError
+from app.config import settings
 from app.core_analysis.state import AgentState
+from app.core_analysis.unit_index import unit_index
+from app.utils.metrics import timed_stage
+from app.utils.workspace import workspace_manager
 
-async def run(state: AgentState) -> AgentState:
+def get_changed_files(repo: Repo, base_commit, head_commit):
+    """Lista os arquivos alterados entre dois commits, ou None se a base não estiver disponível."""
+    if not base_commit or set(base_commit) == {'0'}:
+        return None
+    try:
+        diff = repo.git.diff('--name-only', '--no-renames', base_commit, head_commit)
+    except GitCommandError:
+        return None
+    return [line for line in diff.splitlines() if line]
+
+async def run(state: AgentState) -> dict:
     print("--- Running Triage Agent ---")
+    update = {}
     repo_url = state['repo_url']
-    repo_name = repo_url.split('/')[-1].replace('.git', '')
-    clone_path = f"/tmp/{repo_name}"
 
     try:
-        if os.path.exists(clone_path):
-            print(f"Repository already exists at {clone_path}. Pulling latest changes.")
-            repo = Repo(clone_path)
-            origin = repo.remotes.origin
-            origin.pull()
-        else:
-            print(f"Cloning repository from {repo_url} to {clone_path}.")
-            Repo.clone_from(repo_url, clone_path)
-        
-        state['clone_path'] = clone_path
-        state['error'] = None
-        state['processing_log'] = [f"Successfully cloned/updated repository at {clone_path}"]
+        # Shared bare mirror + per-job worktree pinned to the pushed commit
+        with timed_stage("git_checkout"):
+            clone_path = await asyncio.to_thread(workspace_manager.checkout, repo_url, state.get('commit_hash'))
+        repo = Repo(clone_path)
+
+        changed_files = None
+        if settings.incremental_analysis:
+            # The index reflects the last analyzed commit, which may be older than `before`
+            base_commit = unit_index.get_commit(repo_url) or state.get('base_commit')
+            with timed_stage("git_diff"):
+                changed_files = get_changed_files(repo, base_commit, repo.head.commit.hexsha)
+            if changed_files is not None:
+                print(f"Incremental analysis: {len(changed_files)} changed files since {base_commit[:7]}.")
+
+        update['clone_path'] = clone_path
+        update['changed_files'] = changed_files
+        update['processing_log'] = [f"Checked out {repo.head.commit.hexsha[:7]} at {clone_path}"]
 
     except GitCommandError as e:
         print(f"Error during git operation: {e}")
-        state['error'] = str(e)
-        state['processing_log'] = [f"Failed to clone/update repository: {e}"]
+        update['error'] = str(e)
+        update['processing_log'] = [f"Failed to clone/update repository: {e}"]
 
-    return state
+    return update
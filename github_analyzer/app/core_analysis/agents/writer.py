@@ -1,8 +1,11 @@
 import os
+from app.config import settings
 from app.core_analysis.state import AgentState
+from app.utils.workspace import repo_slug
 
-async def run(state: AgentState) -> AgentState:
+async def run(state: AgentState) -> dict:
     print("--- Running Writer Agent ---")
+    update = {}
     clone_path = state['clone_path']
     final_report = state['final_report']
     
@@ -13,7 +16,14 @@ async def run(state: AgentState) -> AgentState:
         
     with open(readme_path, 'w') as f:
         f.write(final_report)
+
+    # The job worktree is removed after the run, so keep a copy of every report
+    owner, repo = repo_slug(state['repo_url'])
+    report_path = os.path.join(settings.data_dir, 'reports', owner, repo, f"{state['commit_hash']}.md")
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, 'w') as f:
+        f.write(final_report)
         
-    state['processing_log'] = [f"Final report written to {readme_path}"]
+    update['processing_log'] = [f"Final report written to {readme_path} and {report_path}"]
     
-    return state
+    return update
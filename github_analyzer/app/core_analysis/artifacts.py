@@ -0,0 +1,160 @@
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.config import settings
+from app.core_analysis.state import AgentState, CodeUnit
+
+ARTIFACTS_DIR = os.path.join(settings.data_dir, "artifacts")
+
+# Arquivos mapeados abertos ao mesmo tempo por job
+MAX_OPEN_MAPS = 128
+
+
+class ArtifactStore:
+    """Conteúdo das unidades de um job fora do AgentState.
+
+    O estado (e cada checkpoint) guarda só referências compactas:
+    - código: intervalo de bytes (`start_byte`, `end_byte`) no arquivo do worktree,
+      lido sob demanda via mmap;
+    - documentação gerada: SHA-256 do texto, em arquivos endereçados pelo
+      conteúdo em `root`, compartilhados por todos os jobs e commits: um texto
+      já gravado só tem o mtime renovado.
+    O worktree é recriado no mesmo commit quando o job é retomado, e os textos
+    ficam em DATA_DIR enquanto algum job recente os referenciar (ver
+    `prune_artifacts`), então as referências continuam válidas entre processos.
+    """
+
+    def __init__(self, clone_path: str, root: str = ARTIFACTS_DIR):
+        self.clone_path = clone_path
+        self.root = root
+        self._lock = threading.Lock()
+        self._maps: "OrderedDict[str, mmap.mmap]" = OrderedDict()
+
+    def _read(self, rel_path: str, start: int, end: Optional[int]) -> bytes:
+        # Slicing happens under the lock, so an evicted map is never read after being closed
+        with self._lock:
+            mapped = self._maps.get(rel_path)
+            if mapped is None:
+                with open(os.path.join(self.clone_path, rel_path), 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[rel_path] = mapped
+                while len(self._maps) > MAX_OPEN_MAPS:
+                    self._maps.popitem(last=False)[1].close()
+            else:
+                self._maps.move_to_end(rel_path)
+            return mapped[start:end]
+
+    def code(self, unit: CodeUnit) -> str:
+        """Código-fonte da unidade, lido do worktree."""
+        return self._read(unit['file_path'], unit['start_byte'], unit['end_byte']).decode('utf8', errors='replace')
+
+    def decorators(self, unit: CodeUnit) -> str:
+        """Decoradores da unidade (rotas, permissões), que ficam fora do intervalo do código."""
+        start = unit.get('decorator_start_byte', unit['start_byte'])
+        if start >= unit['start_byte']:
+            return ''
+        return self._read(unit['file_path'], start, unit['start_byte']).decode('utf8', errors='replace')
+
+    def file_text(self, rel_path: str) -> str:
+        """Conteúdo completo de um arquivo do worktree."""
+        return self._read(rel_path, 0, None).decode('utf8', errors='replace')
+
+    def put_text(self, text: str) -> str:
+        data = text.encode('utf8')
+        ref = hashlib.sha256(data).hexdigest()
+        path = self._path(ref)
+        try:
+            # Already stored: only mark it as still referenced
+            os.utime(path)
+            return ref
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return ref
+
+    def _path(self, ref: str) -> str:
+        return os.path.join(self.root, ref[:2], ref)
+
+    def text(self, ref: Optional[str]) -> Optional[str]:
+        if ref is None:
+            return None
+        with open(self._path(ref), 'rb') as f:
+            return f.read().decode('utf8')
+
+    def set_documentation(self, unit: CodeUnit, documentation: Optional[str]):
+        unit['documentation_ref'] = self.put_text(documentation) if documentation is not None else None
+
+    def documentation(self, unit: CodeUnit) -> Optional[str]:
+        return self.text(unit.get('documentation_ref'))
+
+    def materialize(self, unit: CodeUnit) -> dict:
+        """Cópia da unidade com a documentação em texto, para o índice persistente."""
+        record = {key: value for key, value in unit.items() if key != 'documentation_ref'}
+        record['documentation'] = self.documentation(unit)
+        return record
+
+    def touch(self, units: List[CodeUnit]):
+        """Renova o mtime dos textos referenciados pelas unidades, para `prune_artifacts` não os remover."""
+        for ref in {unit.get('documentation_ref') for unit in units} - {None}:
+            try:
+                os.utime(self._path(ref))
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+
+_stores: Dict[str, ArtifactStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_artifacts(state: AgentState) -> ArtifactStore:
+    """ArtifactStore do worktree do job, compartilhado pelos agentes do processo."""
+    clone_path = state['clone_path']
+    with _stores_lock:
+        store = _stores.get(clone_path)
+        if store is None:
+            store = _stores[clone_path] = ArtifactStore(clone_path)
+        return store
+
+
+def close_artifacts(clone_path: str):
+    """Fecha os mapeamentos do worktree (chamado antes de removê-lo); os textos continuam no disco."""
+    with _stores_lock:
+        store = _stores.pop(clone_path, None)
+    if store is not None:
+        store.close()
+
+
+def prune_artifacts(before: float, root: str = ARTIFACTS_DIR) -> int:
+    """Remove os textos não referenciados desde `before`; devolve quantos foram removidos.
+
+    Cada job renova o mtime dos textos que usa ao gravá-los e ao terminar, então
+    com o mesmo corte da retenção de checkpoints só saem textos cujos checkpoints
+    já foram removidos.
+    """
+    removed = 0
+    if not os.path.isdir(root):
+        return removed
+    for shard in os.scandir(root):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            try:
+                if entry.stat().st_mtime < before:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
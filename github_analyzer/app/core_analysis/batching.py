@@ -0,0 +1,160 @@
+import json
+import re
+from typing import Awaitable, Callable, List
+from app.config import settings
+from app.core_analysis.artifacts import ArtifactStore
+from app.core_analysis.languages import display_name
+from app.core_analysis.state import CodeUnit, Vulnerability
+from app.utils.concurrency import gather_bounded
+from app.utils.openai_client import openai_client
+from app.utils.tokens import count_tokens
+
+def pack_units(
+    units: List[CodeUnit], artifacts: ArtifactStore, budget_tokens: int, max_units: int, single_unit_tokens: int
+) -> List[List[CodeUnit]]:
+    """Agrupa unidades pequenas em lotes até `budget_tokens`; unidades grandes ficam sozinhas."""
+    batches: List[List[CodeUnit]] = []
+    current: List[CodeUnit] = []
+    current_tokens = 0
+
+    for unit in units:
+        tokens = count_tokens(artifacts.code(unit))
+        if tokens > single_unit_tokens:
+            batches.append([unit])
+            continue
+        if current and (current_tokens + tokens > budget_tokens or len(current) >= max_units):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+def get_batch_prompt(units: List[CodeUnit], framework: str, artifacts: ArtifactStore) -> str:
+    sections = "\n".join(
+        f"""
+    ### UNIT {index}: {unit['unit_type']} `{unit['unit_name']}` ({unit['file_path']})
+    ```{display_name(unit['language'])}
+    {artifacts.decorators(unit)}{artifacts.code(unit)}
+    ```"""
+        for index, unit in enumerate(units)
+    )
+    return f"""
+    You are a senior software engineer and application security specialist. For EACH code unit below (from a {framework} application), do two things:
+    1. Write a docstring in Markdown (in Portuguese) with a short description of its purpose, each parameter (type and purpose) and the return value.
+    2. Look for OWASP Top 10 vulnerabilities (SQL Injection, Command Injection, Insecure Deserialization, XSS, Path Traversal). For each one give "cwe", "description" and "severity" ('High', 'Medium' or 'Low').
+
+    Respond ONLY with a JSON object in the following format, with one entry per unit:
+    {{
+      "units": [
+        {{"id": <unit_number>, "documentation": "<markdown>", "vulnerabilities": [{{"cwe": "...", "description": "...", "severity": "..."}}]}}
+      ]
+    }}
+
+    CODE UNITS:
+    {sections}
+    """
+
+_UNITS_ARRAY = re.compile(r'"units"\s*:\s*\[')
+_SEPARATORS = re.compile(r'[\s,]*')
+
+def _batch_entries(response_text: str) -> list:
+    """Entradas de `units`; de uma resposta cortada no limite de tokens, só as que chegaram completas."""
+    try:
+        return json.loads(response_text).get('units', [])
+    except json.JSONDecodeError:
+        match = _UNITS_ARRAY.search(response_text)
+        if match is None:
+            raise
+    decoder = json.JSONDecoder()
+    entries = []
+    position = match.end()
+    while True:
+        position = _SEPARATORS.match(response_text, position).end()
+        try:
+            entry, position = decoder.raw_decode(response_text, position)
+        except json.JSONDecodeError:
+            return entries
+        entries.append(entry)
+
+def parse_batch_response(response_text: str, count: int) -> dict:
+    """Converte a resposta do lote em {id: entrada}, ignorando ids desconhecidos ou malformados.
+
+    As unidades que faltarem (inclusive por corte da resposta) ficam de fora e
+    são refeitas individualmente por `document_and_scan`.
+    """
+    results = {}
+    for entry in _batch_entries(response_text):
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get('id')
+        if not isinstance(index, int) or not 0 <= index < count or not entry.get('documentation'):
+            continue
+        vulnerabilities = [
+            Vulnerability(cwe=str(v['cwe']), description=str(v['description']), severity=str(v['severity']))
+            for v in entry.get('vulnerabilities') or []
+            if isinstance(v, dict) and {'cwe', 'description', 'severity'} <= v.keys()
+        ]
+        results[index] = {'documentation': entry['documentation'], 'vulnerabilities': vulnerabilities}
+    return results
+
+async def analyze_batch(units: List[CodeUnit], framework: str, artifacts: ArtifactStore) -> dict:
+    prompt = get_batch_prompt(units, framework, artifacts)
+    messages = [{"role": "user", "content": prompt}]
+    response = await openai_client.create_chat_completion(
+        task="batch",
+        complexity=max(unit.get('complexity') or 1 for unit in units),
+        messages=messages,
+        temperature=0.2,
+        max_tokens=min(settings.llm_batch_output_tokens, settings.llm_batch_output_tokens_per_unit * len(units)),
+    )
+    return parse_batch_response(response['choices'][0]['message']['content'], len(units))
+
+async def document_and_scan(
+    units: List[CodeUnit],
+    framework: str,
+    artifacts: ArtifactStore,
+    document_single: Callable[[CodeUnit], Awaitable[str]],
+    failed_documentation: str,
+):
+    """Documenta e analisa as unidades em lotes combinados.
+
+    Unidades de lotes bem-sucedidos saem com `security_checked=True`; as que
+    ficaram em lotes unitários ou faltaram na resposta recebem só a
+    documentação individual e seguem para o agente de segurança.
+    """
+    batches = pack_units(
+        units,
+        artifacts,
+        budget_tokens=settings.llm_batch_token_budget,
+        # The response must fit each unit's docstring and findings, not only the prompt its code
+        max_units=max(1, min(
+            settings.llm_batch_max_units, settings.llm_batch_output_tokens // settings.llm_batch_output_tokens_per_unit
+        )),
+        single_unit_tokens=settings.llm_batch_single_unit_tokens,
+    )
+
+    async def process(batch: List[CodeUnit]):
+        results = {}
+        if len(batch) > 1:
+            try:
+                results = await analyze_batch(batch, framework, artifacts)
+            except Exception as e:
+                print(f"Error analyzing batch of {len(batch)} units, falling back to single requests: {e}")
+
+        for index, unit in enumerate(batch):
+            if index in results:
+                artifacts.set_documentation(unit, results[index]['documentation'])
+                unit['vulnerabilities'] = results[index]['vulnerabilities']
+                unit['security_checked'] = True
+            else:
+                try:
+                    documentation = await document_single(unit)
+                except Exception:
+                    documentation = failed_documentation
+                artifacts.set_documentation(unit, documentation)
+
+    await gather_bounded(process, batches, limit=settings.llm_max_concurrency)
+    return len(batches)
@@ -0,0 +1,86 @@
+import ast
+import hashlib
+from typing import Dict, List
+from app.core_analysis.state import CodeUnit
+
+# Impressão digital de uma unidade de código sobre a árvore sintática normalizada:
+# espaços e comentários não contam, e em funções Python as variáveis locais são
+# renomeadas pela ordem de aparição. Parâmetros, atributos e nomes globais ficam,
+# porque aparecem na documentação gerada. Cópias da mesma função em arquivos ou
+# repositórios diferentes têm a mesma impressão digital.
+
+
+class _LocalRenamer(ast.NodeTransformer):
+    def __init__(self, local_names: set):
+        self.mapping = {}
+        self.local_names = local_names
+
+    def visit_Name(self, node: ast.Name):
+        if node.id in self.local_names:
+            node.id = self.mapping.setdefault(node.id, f"_v{len(self.mapping)}")
+        return node
+
+
+def _local_names(function: ast.AST) -> set:
+    """Nomes atribuídos dentro da função que não são parâmetros nem declarados global/nonlocal."""
+    arguments = function.args
+    parameters = {arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs}
+    parameters.update(arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg)
+    assigned, declared = set(), set()
+    for node in ast.walk(function):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            assigned.add(node.id)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            declared.update(node.names)
+    return assigned - parameters - declared
+
+
+def _python_normal_form(code: str) -> str:
+    tree = ast.parse(code)
+    definition = tree.body[0] if len(tree.body) == 1 else None
+    # Class attributes are part of the public interface, so only function locals are renamed
+    if isinstance(definition, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        tree = _LocalRenamer(_local_names(definition)).visit(tree)
+    return ast.dump(tree, annotate_fields=False, include_attributes=False)
+
+
+def _token_normal_form(node) -> str:
+    """Folhas da árvore do tree-sitter sem comentários, separadas por NUL."""
+    tokens: List[bytes] = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if 'comment' in current.type:
+            continue
+        if current.child_count == 0:
+            tokens.append(current.text)
+        else:
+            stack.extend(reversed(current.children))
+    return b"\0".join(tokens).decode('utf8', errors='replace')
+
+
+def unit_fingerprint(language: str, node, decorators=()) -> str:
+    """SHA-256 da forma normal da unidade (`node` é a definição no tree-sitter).
+
+    Os decoradores entram na impressão digital: a mesma função exposta como rota
+    não é equivalente à função sem o decorador.
+    """
+    normal_form = None
+    if language == 'python':
+        try:
+            normal_form = _python_normal_form(node.text.decode('utf8'))
+        except (SyntaxError, ValueError, UnicodeDecodeError):
+            normal_form = None
+    if normal_form is None:
+        normal_form = _token_normal_form(node)
+    if decorators:
+        normal_form = "\0".join([_token_normal_form(decorator) for decorator in decorators] + [normal_form])
+    return hashlib.sha256(f"{language}\0{normal_form}".encode('utf8')).hexdigest()
+
+
+def group_duplicates(units: List[CodeUnit]) -> List[List[CodeUnit]]:
+    """Agrupa as unidades equivalentes, na ordem original; a primeira de cada grupo é analisada pelas demais."""
+    groups: Dict[str, List[CodeUnit]] = {}
+    for unit in units:
+        groups.setdefault(unit.get('fingerprint') or unit['code_hash'], []).append(unit)
+    return list(groups.values())
@@ -1,35 +1,115 @@
+import os
+import aiosqlite
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from app.config import settings
 from app.core_analysis.state import AgentState
+from app.utils.metrics import instrument_node
 from app.core_analysis.agents import (
-    triage, profiler, evaluator, deconstructor, security, evolution, synthesizer, writer
+    triage, manifest, profiler, evaluator, deconstructor, security, evolution, synthesizer, writer
 )
 
-memory = SqliteSaver.from_conn_string(":memory:")
+CHECKPOINT_DB = os.path.join(settings.data_dir, "checkpoints.sqlite3")
 
-def create_graph():
+def route_after_triage(state: AgentState) -> str:
+    return END if state.get('error') or not state.get('clone_path') else "manifest"
+
+def create_graph(checkpointer=None):
     graph = StateGraph(AgentState)
 
-    graph.add_node("triage", triage.run)
-    graph.add_node("profiler", profiler.run)
-    graph.add_node("evaluator", evaluator.run)
-    graph.add_node("deconstructor", deconstructor.run)
-    graph.add_node("security", security.run)
-    graph.add_node("evolution", evolution.run)
-    graph.add_node("synthesizer", synthesizer.run)
-    graph.add_node("writer", writer.run)
+    graph.add_node("triage", instrument_node("triage", triage.run))
+    graph.add_node("manifest", instrument_node("manifest", manifest.run))
+    graph.add_node("profiler", instrument_node("profiler", profiler.run))
+    graph.add_node("evaluator", instrument_node("evaluator", evaluator.run))
+    graph.add_node("deconstructor", instrument_node("deconstructor", deconstructor.run))
+    graph.add_node("security", instrument_node("security", security.run))
+    graph.add_node("evolution", instrument_node("evolution", evolution.run))
+    graph.add_node("synthesizer", instrument_node("synthesizer", synthesizer.run))
+    graph.add_node("writer", instrument_node("writer", writer.run))
 
     graph.set_entry_point("triage")
 
-    graph.add_edge("triage", "profiler")
+    # Without a worktree there is nothing to analyze; the checkout error is the job's result
+    graph.add_conditional_edges("triage", route_after_triage, {"manifest": "manifest", END: END})
+    # The tree is walked once; every downstream agent reads the manifest
+    graph.add_edge("manifest", "profiler")
+
+    # Independent branches run in parallel after profiler:
+    # evaluator (README), deconstructor -> security (code) and evolution (git log)
     graph.add_edge("profiler", "evaluator")
-    graph.add_edge("evaluator", "deconstructor")
+    graph.add_edge("profiler", "deconstructor")
+    graph.add_edge("profiler", "evolution")
     graph.add_edge("deconstructor", "security")
-    graph.add_edge("security", "evolution")
-    graph.add_edge("evolution", "synthesizer")
+
+    # synthesizer waits for every branch to finish
+    graph.add_edge(["evaluator", "security", "evolution"], "synthesizer")
     graph.add_edge("synthesizer", "writer")
     graph.add_edge("writer", END)
 
-    return graph.compile(checkpointer=memory)
+    return graph.compile(checkpointer=checkpointer)
+
+_checkpointer = None
+_app = None
+
+async def get_checkpointer() -> AsyncSqliteSaver:
+    """Checkpointer em arquivo (WAL) compartilhado pelos processos worker; criado uma vez por processo."""
+    global _checkpointer
+    if _checkpointer is None:
+        os.makedirs(os.path.dirname(CHECKPOINT_DB), exist_ok=True)
+        conn = await aiosqlite.connect(CHECKPOINT_DB, timeout=30)
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        _checkpointer = AsyncSqliteSaver(conn)
+        await _checkpointer.setup()
+    return _checkpointer
+
+async def get_app():
+    global _app
+    if _app is None:
+        _app = create_graph(await get_checkpointer())
+    return _app
+
+def thread_config(commit_hash: str) -> dict:
+    return {"configurable": {"thread_id": commit_hash}}
+
+async def is_interrupted(commit_hash: str) -> bool:
+    """True se a thread tem checkpoint com nós ainda pendentes (execução interrompida)."""
+    snapshot = await (await get_app()).aget_state(thread_config(commit_hash))
+    return bool(snapshot.values) and bool(snapshot.next)
+
+async def can_resume(commit_hash: str) -> bool:
+    """True se a execução interrompida passou da triagem (há worktree para recriar); senão ela recomeça do zero."""
+    snapshot = await (await get_app()).aget_state(thread_config(commit_hash))
+    return bool(snapshot.values.get('clone_path'))
+
+async def find_interrupted_threads() -> list:
+    """Lista (thread_id, repo_url) das execuções que pararam antes do fim."""
+    checkpointer = await get_checkpointer()
+    async with checkpointer.conn.execute(
+        "SELECT DISTINCT thread_id FROM checkpoints WHERE checkpoint_ns = ''"
+    ) as cursor:
+        thread_ids = [row[0] for row in await cursor.fetchall()]
+
+    app = await get_app()
+    interrupted = []
+    for thread_id in thread_ids:
+        snapshot = await app.aget_state(thread_config(thread_id))
+        if snapshot.values and snapshot.next:
+            interrupted.append((thread_id, snapshot.values.get('repo_url')))
+    return interrupted
+
+async def prune_threads(thread_ids: list):
+    """Remove os checkpoints das threads informadas que ainda existem no banco."""
+    checkpointer = await get_checkpointer()
+    async with checkpointer.conn.execute("SELECT DISTINCT thread_id FROM checkpoints") as cursor:
+        existing = {row[0] for row in await cursor.fetchall()}
+    for thread_id in set(thread_ids) & existing:
+        await checkpointer.adelete_thread(thread_id)
 
-app = create_graph()
+async def close():
+    """Fecha a conexão do checkpointer (a thread do aiosqlite impede o encerramento do processo)."""
+    global _checkpointer, _app
+    if _checkpointer is not None:
+        await _checkpointer.conn.close()
+    _checkpointer = None
+    _app = None
@@ -0,0 +1,263 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+from app.config import settings
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+
+
+class JobQueue:
+    """Fila durável de análises em SQLite, compartilhada entre o web e os workers de análise.
+
+    Garante no máximo um job em execução por repositório e, ao enfileirar um
+    novo push, marca como `superseded` os jobs ainda pendentes do mesmo
+    repositório, de modo que apenas o commit mais recente seja analisado.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                repo TEXT NOT NULL,
+                repo_url TEXT NOT NULL,
+                commit_hash TEXT NOT NULL,
+                base_commit TEXT,
+                status TEXT NOT NULL,
+                error TEXT,
+                worker TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                heartbeat_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_repo ON jobs (repo, status);
+            CREATE TABLE IF NOT EXISTS job_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id, id);
+            CREATE TABLE IF NOT EXISTS webhook_deliveries (
+                delivery_id TEXT PRIMARY KEY,
+                job_id INTEGER,
+                received_at REAL NOT NULL
+            );
+            """
+        )
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, repo: str, repo_url: str, commit_hash: str, base_commit: Optional[str] = None) -> int:
+        return self._transaction(lambda conn: self._enqueue(conn, repo, repo_url, commit_hash, base_commit))
+
+    def _enqueue(self, conn, repo: str, repo_url: str, commit_hash: str, base_commit: Optional[str]) -> int:
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE repo = ? AND status = ?",
+            (SUPERSEDED, now, repo, QUEUED),
+        )
+        cursor = conn.execute(
+            "INSERT INTO jobs (repo, repo_url, commit_hash, base_commit, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (repo, repo_url, commit_hash, base_commit, QUEUED, now),
+        )
+        return cursor.lastrowid
+
+    def enqueue_delivery(self, delivery_id: str, repo: str, repo_url: str, commit_hash: str,
+                         base_commit: Optional[str] = None, history: int = 10000) -> Tuple[int, bool]:
+        """Enfileira o push de uma entrega de webhook, ignorando reenvios do mesmo `X-GitHub-Delivery`.
+
+        Devolve (job_id, duplicada). Apenas as `history` entregas mais recentes são lembradas.
+        """
+        def op(conn):
+            row = conn.execute(
+                "SELECT job_id FROM webhook_deliveries WHERE delivery_id = ?", (delivery_id,)
+            ).fetchone()
+            if row is not None:
+                return row[0], True
+            job_id = self._enqueue(conn, repo, repo_url, commit_hash, base_commit)
+            cursor = conn.execute(
+                "INSERT INTO webhook_deliveries (delivery_id, job_id, received_at) VALUES (?, ?, ?)",
+                (delivery_id, job_id, time.time()),
+            )
+            conn.execute("DELETE FROM webhook_deliveries WHERE rowid <= ?", (cursor.lastrowid - history,))
+            return job_id, False
+        return self._transaction(op)
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Reserva o job pendente mais antigo de um repositório sem job em execução."""
+        def op(conn):
+            now = time.time()
+            row = conn.execute(
+                """
+                SELECT * FROM jobs AS j
+                WHERE j.status = ?
+                  AND NOT EXISTS (SELECT 1 FROM jobs AS r WHERE r.repo = j.repo AND r.status = ?)
+                ORDER BY j.created_at
+                LIMIT 1
+                """,
+                (QUEUED, RUNNING),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (RUNNING, worker, now, now, row["id"]),
+            )
+            return dict(row, status=RUNNING, worker=worker, started_at=now)
+        return self._transaction(op)
+
+    def heartbeat(self, job_id: int):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def finish(self, job_id: int, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (FAILED if error else DONE, error, time.time(), job_id),
+            )
+
+    def requeue_stale(self, lease_seconds: int) -> int:
+        """Devolve à fila os jobs cujo worker parou de enviar heartbeats (ex.: reinício do processo)."""
+        def op(conn):
+            cutoff = time.time() - lease_seconds
+            stale = conn.execute(
+                "SELECT id, repo FROM jobs WHERE status = ? AND heartbeat_at < ?", (RUNNING, cutoff)
+            ).fetchall()
+            for row in stale:
+                newer = conn.execute(
+                    "SELECT 1 FROM jobs WHERE repo = ? AND status = ? AND id > ?", (row["repo"], QUEUED, row["id"])
+                ).fetchone()
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL WHERE id = ?",
+                    (SUPERSEDED if newer else QUEUED, row["id"]),
+                )
+            return len(stale)
+        return self._transaction(op)
+
+    def enqueue_if_idle(self, repo: str, repo_url: str, commit_hash: str) -> Optional[int]:
+        """Enfileira um job recuperado apenas se o repositório não tiver outro pendente ou em execução."""
+        def op(conn):
+            busy = conn.execute(
+                "SELECT 1 FROM jobs WHERE repo = ? AND status IN (?, ?)", (repo, QUEUED, RUNNING)
+            ).fetchone()
+            if busy:
+                return None
+            cursor = conn.execute(
+                "INSERT INTO jobs (repo, repo_url, commit_hash, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (repo, repo_url, commit_hash, QUEUED, time.time()),
+            )
+            return cursor.lastrowid
+        return self._transaction(op)
+
+    def get_by_commit(self, commit_hash: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE commit_hash = ? ORDER BY id DESC LIMIT 1", (commit_hash,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def finished_commits(self, before: float) -> List[str]:
+        """Commits cujo job mais recente terminou antes de `before` e que não têm job ativo."""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT commit_hash FROM jobs
+                GROUP BY commit_hash
+                HAVING MAX(CASE WHEN status IN (?, ?) THEN 1 ELSE 0 END) = 0
+                   AND MAX(COALESCE(finished_at, created_at)) < ?
+                """,
+                (QUEUED, RUNNING, before),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    @staticmethod
+    def _repo_filter(repos: Optional[Iterable[str]]) -> Tuple[List[str], list]:
+        if repos is None:
+            return [], []
+        repos = sorted({repo.lower() for repo in repos})
+        if not repos:
+            return ["0"], []
+        return [f"lower(repo) IN ({','.join('?' * len(repos))})"], repos
+
+    def get(self, job_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, repo: Optional[str] = None, limit: int = 50, repos: Optional[Iterable[str]] = None) -> List[dict]:
+        """Jobs mais recentes primeiro; `repos` restringe aos repositórios informados (owner/repo, sem diferenciar caixa)."""
+        conditions, params = self._repo_filter(repos)
+        if repo:
+            conditions.append("repo = ?")
+            params.append(repo)
+        query = "SELECT * FROM jobs"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_event(self, job_id: int, event_type: str, data: dict):
+        """Registra um evento de progresso do job, consumido pelo endpoint SSE."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO job_events (job_id, type, data, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, event_type, json.dumps(data), time.time()),
+            )
+
+    def events_after(self, job_id: int, last_id: int = 0, limit: int = 500) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, type, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (job_id, last_id, limit),
+            ).fetchall()
+        return [{"id": row["id"], "type": row["type"], "data": json.loads(row["data"])} for row in rows]
+
+    def prune_events(self, before: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM job_events WHERE created_at < ?", (before,))
+        return cursor.rowcount
+
+    def depth(self, repos: Optional[Iterable[str]] = None) -> dict:
+        conditions, params = self._repo_filter(repos)
+        conditions.append("status IN (?, ?)")
+        params += [QUEUED, RUNNING]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT status, COUNT(*) FROM jobs WHERE {' AND '.join(conditions)} GROUP BY status", params
+            ).fetchall()
+        counts = {QUEUED: 0, RUNNING: 0}
+        counts.update(dict(rows))
+        return counts
+
+
+job_queue = JobQueue(os.path.join(settings.data_dir, "jobs.sqlite3"))
@@ -0,0 +1,113 @@
+import importlib
+import os
+from typing import Dict, Optional, Tuple
+
+# Registro de linguagens suportadas pelo deconstructor: módulo da gramática,
+# função que devolve o ponteiro da linguagem, extensões e query de extração de unidades.
+# As capturas seguem a convenção `@function.name` / `@class.name`; o pai do nó
+# capturado é a definição completa da unidade.
+LANGUAGES: Dict[str, dict] = {
+    'python': {
+        'module': 'tree_sitter_python',
+        'loader': 'language',
+        'extensions': ('.py',),
+        'query': """
+        (function_definition
+          name: (identifier) @function.name)
+        (class_definition
+          name: (identifier) @class.name)
+        """,
+    },
+    'javascript': {
+        'module': 'tree_sitter_javascript',
+        'loader': 'language',
+        'extensions': ('.js', '.jsx', '.mjs', '.cjs'),
+        'query': """
+        (function_declaration
+          name: (identifier) @function.name)
+        (generator_function_declaration
+          name: (identifier) @function.name)
+        (method_definition
+          name: (property_identifier) @function.name)
+        (variable_declarator
+          name: (identifier) @function.name
+          value: [(arrow_function) (function_expression)])
+        (class_declaration
+          name: (identifier) @class.name)
+        """,
+    },
+    'typescript': {
+        'module': 'tree_sitter_typescript',
+        'loader': 'language_typescript',
+        'extensions': ('.ts', '.mts', '.cts'),
+        'query': """
+        (function_declaration
+          name: (identifier) @function.name)
+        (method_definition
+          name: (property_identifier) @function.name)
+        (variable_declarator
+          name: (identifier) @function.name
+          value: [(arrow_function) (function_expression)])
+        (class_declaration
+          name: (type_identifier) @class.name)
+        (abstract_class_declaration
+          name: (type_identifier) @class.name)
+        """,
+    },
+    'tsx': {
+        'module': 'tree_sitter_typescript',
+        'loader': 'language_tsx',
+        'extensions': ('.tsx',),
+        'query': None,  # Mesma query do TypeScript
+    },
+    'java': {
+        'module': 'tree_sitter_java',
+        'loader': 'language',
+        'extensions': ('.java',),
+        'query': """
+        (method_declaration
+          name: (identifier) @function.name)
+        (constructor_declaration
+          name: (identifier) @function.name)
+        (class_declaration
+          name: (identifier) @class.name)
+        (interface_declaration
+          name: (identifier) @class.name)
+        (enum_declaration
+          name: (identifier) @class.name)
+        """,
+    },
+}
+LANGUAGES['tsx']['query'] = LANGUAGES['typescript']['query']
+
+EXTENSION_TO_LANGUAGE: Dict[str, str] = {
+    extension: name for name, spec in LANGUAGES.items() for extension in spec['extensions']
+}
+
+# Nome exibido nos prompts (tsx é tratado como TypeScript)
+DISPLAY_NAMES = {'tsx': 'typescript'}
+
+def language_for_path(path: str) -> Optional[str]:
+    return EXTENSION_TO_LANGUAGE.get(os.path.splitext(path)[1].lower())
+
+def display_name(language: str) -> str:
+    return DISPLAY_NAMES.get(language, language)
+
+# Cache por processo de (parser, query) compilados, reaproveitado entre jobs
+_compiled: Dict[str, Optional[Tuple[object, object]]] = {}
+
+def get_parser_and_query(language: str):
+    """Devolve (Parser, Query) da linguagem, ou None se a gramática não estiver instalada."""
+    if language not in _compiled:
+        from tree_sitter import Language, Parser, Query
+
+        spec = LANGUAGES[language]
+        try:
+            module = importlib.import_module(spec['module'])
+        except ImportError:
+            print(f"Grammar package '{spec['module']}' not installed; skipping {language} files.")
+            _compiled[language] = None
+        else:
+            ts_language = Language(getattr(module, spec['loader'])())
+            _compiled[language] = (Parser(ts_language), Query(ts_language, spec['query']))
+    return _compiled[language]
@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from app.config import settings
+from app.core_analysis.fingerprint import unit_fingerprint
+from app.core_analysis.languages import LANGUAGES, get_parser_and_query, language_for_path
+
+def _init_worker():
+    # Each pool process loads every grammar and compiles its query exactly once
+    for language in LANGUAGES:
+        get_parser_and_query(language)
+
+def _captures(query, node):
+    """Retorna [(node, capture_name)] em ordem de posição, independente da versão do tree-sitter."""
+    try:
+        from tree_sitter import QueryCursor
+        captures = QueryCursor(query).captures(node)
+    except ImportError:
+        captures = query.captures(node)
+    if isinstance(captures, dict):
+        captures = [(n, name) for name, nodes in captures.items() for n in nodes]
+    return sorted(captures, key=lambda capture: capture[0].start_byte)
+
+# Tokens that open a new path through the code, in any supported grammar
+DECISION_TOKENS = {'if', 'elif', 'for', 'while', 'case', 'catch', 'except', 'and', 'or', '&&', '||', '??', '?'}
+
+def _cyclomatic_complexity(node) -> int:
+    """Complexidade ciclomática aproximada: 1 + número de pontos de decisão na árvore da unidade."""
+    decisions = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.child_count == 0:
+            decisions += current.type in DECISION_TOKENS
+        else:
+            stack.extend(current.children)
+    return 1 + decisions
+
+def parse_files(files: List[Tuple[str, str]]) -> List[dict]:
+    """Extrai as unidades de um lote de arquivos (executado dentro do pool).
+
+    Recebe pares (caminho relativo, caminho absoluto) e devolve, por arquivo,
+    um registro compacto com a linguagem detectada pela extensão e as unidades encontradas.
+    """
+    records = []
+    for rel_path, file_path in files:
+        language = language_for_path(rel_path)
+        compiled = get_parser_and_query(language) if language else None
+        if compiled is None:
+            records.append({"file_path": rel_path, "language": language, "units": [], "error": "unsupported language"})
+            continue
+        parser, query = compiled
+
+        try:
+            with open(file_path, 'rb') as f:
+                code = f.read()
+            tree = parser.parse(code)
+        except (OSError, ValueError) as e:
+            records.append({"file_path": rel_path, "language": language, "units": [], "error": str(e)})
+            continue
+
+        units = []
+        for node, capture_name in _captures(query, tree.root_node):
+            definition = node.parent
+            # Python decorators (routes, permissions) live in the parent node; the unit keeps the bare
+            # definition, which parses on its own, and points to where its decorators start
+            decorated = definition.parent if definition.parent and definition.parent.type == 'decorated_definition' else definition
+            decorators = [child for child in decorated.children if child.type == 'decorator']
+            units.append({
+                "unit_name": node.text.decode('utf8', errors='replace'),
+                "unit_type": 'function' if 'function' in capture_name else 'class',
+                "start_byte": definition.start_byte,
+                "end_byte": definition.end_byte,
+                "decorator_start_byte": decorated.start_byte,
+                "code_hash": hashlib.sha256(decorated.text).hexdigest(),
+                "fingerprint": unit_fingerprint(language, definition, decorators),
+                "complexity": _cyclomatic_complexity(definition),
+            })
+        records.append({"file_path": rel_path, "language": language, "units": units, "error": None})
+    return records
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _pool_context():
+    """Contexto do pool: os processos não repetem a inicialização do processo principal.
+
+    Com `spawn`, cada processo reimporta o `__main__` (ex.: `python -m app.worker`)
+    e, com ele, abre os bancos da fila, do cache e do índice. Com o forkserver, o
+    parsing e os módulos da aplicação já carregados aqui são importados uma vez no
+    servidor; os processos do pool, bifurcados dele, reexecutam só o corpo do
+    `__main__`, com os imports já prontos.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    package = __name__.split('.')[0]
+    loaded = sorted(name for name in sys.modules if name.startswith(f"{package}."))
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__] + loaded)
+    return context
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.parser_processes or os.cpu_count(),
+            mp_context=_pool_context(),
+            initializer=_init_worker,
+        )
+    return _executor
+
+async def extract_units(files: List[Tuple[str, str]]) -> List[dict]:
+    """Distribui os arquivos em lotes pelo pool de processos e devolve os registros na ordem de entrada."""
+    if not files:
+        return []
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    batch_size = max(1, settings.parser_batch_size)
+    batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+    results = await asyncio.gather(*(loop.run_in_executor(executor, parse_files, batch) for batch in batches))
+    return [record for batch in results for record in batch]
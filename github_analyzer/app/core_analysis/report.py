@@ -0,0 +1,131 @@
+"""Renderização local das seções do relatório que não precisam do LLM.
+
+A tabela de vulnerabilidades, a documentação por arquivo e a linha do tempo
+dos commits são montadas diretamente a partir do estado; apenas os resumos
+compactos por módulo passam pelo modelo (ver agents/synthesizer.py).
+"""
+import os
+from collections import Counter
+from typing import Dict, List, Optional
+from app.core_analysis.artifacts import ArtifactStore
+from app.core_analysis.state import CodeUnit, CommitInfo, DocumentationScore
+from app.utils.tokens import truncate_to_tokens
+
+SEVERITY_ORDER = {'High': 0, 'Medium': 1, 'Low': 2}
+
+
+def module_of(file_path: str) -> str:
+    """Módulo de uma unidade: o diretório do arquivo relativo à raiz do repositório."""
+    return os.path.dirname(file_path) or '.'
+
+
+def group_by_module(units: List[CodeUnit]) -> Dict[str, List[CodeUnit]]:
+    modules: Dict[str, List[CodeUnit]] = {}
+    for unit in units:
+        modules.setdefault(module_of(unit['file_path']), []).append(unit)
+    return dict(sorted(modules.items()))
+
+
+def _first_line(text: Optional[str]) -> str:
+    for line in (text or '').splitlines():
+        line = line.strip().lstrip('#').strip()
+        if line and not line.startswith('```'):
+            return line
+    return ''
+
+
+def module_digest(units: List[CodeUnit], artifacts: ArtifactStore, max_tokens: int) -> str:
+    """Uma linha por unidade (tipo, nome, arquivo e início da documentação), limitada a `max_tokens`."""
+    lines = []
+    for unit in units:
+        line = f"- {unit['unit_type']} `{unit['unit_name']}` ({os.path.basename(unit['file_path'])})"
+        summary = _first_line(artifacts.documentation(unit))
+        if summary:
+            line += f": {summary[:200]}"
+        if unit['vulnerabilities']:
+            line += f" [{len(unit['vulnerabilities'])} potential vulnerabilities]"
+        lines.append(line)
+    return truncate_to_tokens('\n'.join(lines), max_tokens)
+
+
+def severity_counts(units: List[CodeUnit]) -> Counter:
+    return Counter(vuln.get('severity', 'Unknown') for unit in units for vuln in unit['vulnerabilities'])
+
+
+def _cell(text) -> str:
+    return str(text).replace('|', '\\|').replace('\n', ' ')
+
+
+def render_header(repo_name: str, language: str, framework: str) -> str:
+    return (
+        f"# Intelligent Analysis Report for: {repo_name}\n\n"
+        f"## 1. Project Overview\n"
+        f"- **Primary Language:** {language}\n"
+        f"- **Detected Framework:** {framework}\n\n"
+    )
+
+
+def render_documentation_score(score: Optional[DocumentationScore]) -> str:
+    if not score:
+        return "## 2. Existing Documentation Analysis\nNo existing documentation could be evaluated.\n\n"
+    return (
+        f"## 2. Existing Documentation Analysis\n"
+        f"- **Quality Score:** {score['score']:.2f} / 1.0\n"
+        f"- **AI Analyst Evaluation:** {score['reasoning']}\n\n"
+    )
+
+
+def render_vulnerability_table(units: List[CodeUnit]) -> str:
+    rows = [
+        (vuln, unit)
+        for unit in units
+        for vuln in unit['vulnerabilities']
+    ]
+    rows.sort(key=lambda row: (SEVERITY_ORDER.get(row[0].get('severity'), len(SEVERITY_ORDER)), row[1]['file_path']))
+
+    parts = [
+        "## 3. Security Analysis Report (SAST)\n",
+        "The static analysis identified the following potential vulnerabilities. Manual review is recommended.\n\n",
+    ]
+    if not rows:
+        parts.append("No potential vulnerabilities were identified.\n\n")
+        return ''.join(parts)
+    parts.append("| Severity | CWE | Description | Location |\n|----------|-----|-------------|----------|\n")
+    for vuln, unit in rows:
+        parts.append(
+            f"| {_cell(vuln.get('severity', ''))} | {_cell(vuln.get('cwe', ''))} | {_cell(vuln.get('description', ''))} "
+            f"| {_cell(unit['unit_name'])} in {_cell(unit['file_path'])} |\n"
+        )
+    parts.append("\n")
+    return ''.join(parts)
+
+
+def render_documentation(
+    units: List[CodeUnit], artifacts: ArtifactStore, module_summaries: Optional[Dict[str, str]] = None
+) -> str:
+    """Documentação agrupada por módulo e arquivo, com o resumo de cada módulo quando houver."""
+    module_summaries = module_summaries or {}
+    parts = [
+        "## 4. AI-Generated Code Documentation\n",
+        "Below is detailed documentation for the functions and classes identified in the project.\n\n",
+    ]
+    for module, module_units in group_by_module(units).items():
+        parts.append(f"### Module `{module}`\n\n")
+        if module_summaries.get(module):
+            parts.append(f"{module_summaries[module]}\n\n")
+        current_file = None
+        for unit in sorted(module_units, key=lambda unit: unit['file_path']):
+            if unit['file_path'] != current_file:
+                current_file = unit['file_path']
+                parts.append(f"#### `{current_file}`\n\n")
+            parts.append(f"##### {unit['unit_name']}\n{artifacts.documentation(unit) or 'No documentation available.'}\n\n")
+    return ''.join(parts)
+
+
+def render_commit_timeline(commits: List[CommitInfo]) -> str:
+    parts = [f"## 5. Recent Project Evolution\nAnalysis of the {len(commits)} most recent commits:\n"]
+    for commit in commits:
+        stats = f" _({commit['files_changed']} files, +{commit['insertions']}/-{commit['deletions']})_" if 'files_changed' in commit else ""
+        parts.append(f"- **Commit `{commit['hash'][:7]}` by {commit['author']}:** {commit['summary_of_changes']}{stats}\n")
+    parts.append("\n")
+    return ''.join(parts)
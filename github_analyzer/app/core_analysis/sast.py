@@ -0,0 +1,217 @@
+import ast
+import re
+from typing import Dict, List, Optional, Tuple
+from app.core_analysis.state import CodeUnit, Vulnerability
+from app.utils.tokens import outline_code
+
+# Pré-análise local e determinística (sem LLM) das unidades de código.
+# Cada regra casa um sink perigoso; os achados entram como vulnerabilidades
+# preliminares e decidem quais unidades seguem para a análise do LLM.
+
+COMMAND_CALLS = {'os.system', 'os.popen', 'os.popen2', 'os.popen3', 'commands.getoutput', 'commands.getstatusoutput',
+                 'subprocess.getoutput', 'subprocess.getstatusoutput'}
+DESERIALIZE_CALLS = {'pickle.loads', 'pickle.load', 'cPickle.loads', 'cPickle.load', 'dill.loads', 'dill.load',
+                     'marshal.loads', 'marshal.load', 'shelve.open', 'jsonpickle.decode', 'yaml.unsafe_load'}
+SQL_METHODS = {'execute', 'executemany', 'executescript', 'raw', 'extra', 'text'}
+PATH_CALLS = {'os.path.join', 'open', 'send_file', 'send_from_directory', 'FileResponse', 'Path', 'pathlib.Path'}
+UNTRUSTED_ROOTS = {'request', 'req'}
+
+# (cwe, severidade, descrição) de cada regra
+RULES: Dict[str, Tuple[str, str, str]] = {
+    'command-injection': ('CWE-78', 'High', 'Shell command built and executed by {sink}.'),
+    'subprocess-shell': ('CWE-78', 'High', '{sink} called with shell=True.'),
+    'insecure-deserialization': ('CWE-502', 'High', 'Untrusted data deserialized with {sink}.'),
+    'code-injection': ('CWE-95', 'High', 'Dynamic code evaluated with {sink}.'),
+    'sql-injection': ('CWE-89', 'High', 'SQL query built with string formatting passed to {sink}.'),
+    'path-traversal': ('CWE-22', 'Medium', 'Filesystem path built from request data in {sink}.'),
+    'xss': ('CWE-79', 'Medium', 'Raw HTML written through {sink}.'),
+}
+
+# Regras por expressão regular para as demais linguagens (e para trechos Python que não compilam)
+PATTERN_RULES: Dict[str, List[Tuple[str, "re.Pattern"]]] = {
+    'python': [
+        ('command-injection', re.compile(r'\bos\.(system|popen)\s*\(|(?<![\w.])(system|popen)\s*\(')),
+        ('subprocess-shell', re.compile(r'[\w.]+\s*\([^)]*\bshell\s*=\s*True')),
+        ('insecure-deserialization', re.compile(r'\b(c?[Pp]ickle|dill|marshal)\.loads?\s*\(|\byaml\.unsafe_load\s*\(|(?<![\w.])loads?\s*\(')),
+        ('code-injection', re.compile(r'(?<![\w.])(eval|exec)\s*\(\s*[^\s\'")]')),
+        ('sql-injection', re.compile(r'\.(execute|executemany|raw)\s*\(\s*(f[\'"]|[\'"][^\'"]*[\'"]\s*(%|\+|\.format))')),
+    ],
+    'javascript': [
+        ('command-injection', re.compile(r'\b(exec|execSync)\s*\(\s*(`[^`]*\$\{|[^,)]*\+)')),
+        ('code-injection', re.compile(r'(?<![\w.])eval\s*\(|\bnew\s+Function\s*\(')),
+        ('sql-injection', re.compile(r'\.(query|execute|raw)\s*\(\s*(`[^`]*\$\{|[\'"][^\'"]*[\'"]\s*\+)')),
+        ('path-traversal', re.compile(r'\b(path\.(join|resolve)|sendFile|readFile(Sync)?|createReadStream)\s*\([^)]*\breq\.(params|query|body)')),
+        ('xss', re.compile(r'\.innerHTML\s*=|\bdangerouslySetInnerHTML\b|\bdocument\.write\s*\(')),
+    ],
+    'java': [
+        ('command-injection', re.compile(r'\bRuntime\.getRuntime\(\)\.exec\s*\(|\bnew\s+ProcessBuilder\s*\([^)]*\+')),
+        ('insecure-deserialization', re.compile(r'\bnew\s+ObjectInputStream\s*\(')),
+        ('sql-injection', re.compile(r'\.(executeQuery|executeUpdate|execute|prepareStatement|createQuery|createNativeQuery)\s*\(\s*"[^"]*"\s*\+')),
+        ('path-traversal', re.compile(r'\b(new\s+File|Paths\.get|Path\.of)\s*\([^)]*getParameter\s*\(')),
+    ],
+}
+PATTERN_RULES['typescript'] = PATTERN_RULES['tsx'] = PATTERN_RULES['javascript']
+
+# Unidades que tocam entrada externa são enviadas ao LLM mesmo sem achados locais
+UNTRUSTED_INPUT = re.compile(
+    r'\b(request|req)\s*\.|\bsys\.argv\b|(?<![\w.])input\s*\(|\bprocess\.argv\b|\bgetParameter\s*\(|'
+    r'@\w+\.(get|post|put|patch|delete|route)\s*\(|@(Get|Post|Put|Patch|Delete|Request)Mapping\b|\blocation\.(search|hash)\b'
+)
+
+
+def _dotted_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        base = _dotted_name(node.value)
+        return f"{base}.{node.attr}" if base else node.attr
+    if isinstance(node, ast.Call):
+        return _dotted_name(node.func)
+    return None
+
+
+def _import_aliases(tree: ast.AST) -> Dict[str, str]:
+    aliases = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    aliases[alias.asname] = alias.name
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            for alias in node.names:
+                if alias.name != '*':
+                    aliases[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+    return aliases
+
+
+def import_aliases(source: str) -> Dict[str, str]:
+    """Nome local -> nome qualificado dos imports de um arquivo Python (`sp` -> `subprocess`, `run` -> `subprocess.run`)."""
+    try:
+        return _import_aliases(ast.parse(source))
+    except (SyntaxError, ValueError):
+        return {}
+
+
+def _resolve(name: Optional[str], aliases: Dict[str, str]) -> str:
+    if not name:
+        return ''
+    head, dot, rest = name.partition('.')
+    return f"{aliases[head]}{dot}{rest}" if head in aliases else name
+
+
+def _is_formatted_string(node: ast.AST) -> bool:
+    """f-string com interpolação, `%`, `+` ou `.format()` aplicados a uma string."""
+    if isinstance(node, ast.JoinedStr):
+        return any(isinstance(value, ast.FormattedValue) for value in node.values)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Mod, ast.Add)):
+        return any(
+            isinstance(side, ast.Constant) and isinstance(side.value, str) or _is_formatted_string(side)
+            for side in (node.left, node.right)
+        )
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'format':
+        return isinstance(node.func.value, ast.Constant) and isinstance(node.func.value.value, str)
+    return False
+
+
+def _uses_untrusted_data(node: ast.AST) -> bool:
+    return any(
+        isinstance(child, ast.Name) and child.id in UNTRUSTED_ROOTS
+        for child in ast.walk(node)
+    )
+
+
+def _keyword(call: ast.Call, name: str) -> Optional[ast.AST]:
+    return next((keyword.value for keyword in call.keywords if keyword.arg == name), None)
+
+
+def _python_hits(tree: ast.AST, aliases: Dict[str, str]) -> List[Tuple[str, str]]:
+    # Imports inside the unit itself shadow the file's
+    aliases = {**aliases, **_import_aliases(tree)}
+    hits = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        name = _resolve(_dotted_name(node.func), aliases)
+        method = name.rsplit('.', 1)[-1]
+        args = list(node.args) + [keyword.value for keyword in node.keywords]
+
+        if name in COMMAND_CALLS or name.startswith(('os.exec', 'os.spawn')):
+            hits.append(('command-injection', name))
+        elif name in DESERIALIZE_CALLS:
+            hits.append(('insecure-deserialization', name))
+        elif name == 'yaml.load':
+            loader = _keyword(node, 'Loader') or (node.args[1] if len(node.args) > 1 else None)
+            if loader is None or 'Safe' not in (_dotted_name(loader) or ''):
+                hits.append(('insecure-deserialization', name))
+        elif name in ('eval', 'exec'):
+            if node.args and not isinstance(node.args[0], ast.Constant):
+                hits.append(('code-injection', name))
+        elif method in SQL_METHODS and node.args and _is_formatted_string(node.args[0]):
+            hits.append(('sql-injection', name))
+        elif name in PATH_CALLS and any(_uses_untrusted_data(arg) for arg in args):
+            hits.append(('path-traversal', name))
+
+        # Any call spawning a shell is suspect, whatever wrapper or alias it goes through
+        shell = _keyword(node, 'shell')
+        if isinstance(shell, ast.Constant) and shell.value is True:
+            hits.append(('subprocess-shell', name or 'call'))
+    return hits
+
+
+def _pattern_hits(code: str, language: str) -> List[Tuple[str, str]]:
+    hits = []
+    for rule, pattern in PATTERN_RULES.get(language, []):
+        match = pattern.search(code)
+        if match:
+            hits.append((rule, match.group(0).split('(')[0].strip()))
+    return hits
+
+
+def scan_unit(unit: CodeUnit, code: str, aliases: Optional[Dict[str, str]] = None) -> List[Vulnerability]:
+    """Vulnerabilidades preliminares encontradas pelas regras locais no código da unidade, uma por regra.
+
+    `aliases` são os imports do arquivo (ver `import_aliases`), para reconhecer
+    `from subprocess import run` ou `import pickle as p`. Classes são analisadas
+    pelo esboço, porque os métodos já são unidades próprias.
+    """
+    code = outline_code(code) if unit['unit_type'] == 'class' else code
+    language = unit.get('language', '')
+
+    hits = None
+    if language == 'python':
+        try:
+            hits = _python_hits(ast.parse(code), aliases or {})
+        except (SyntaxError, ValueError):
+            hits = None
+    if hits is None:
+        hits = _pattern_hits(code, language)
+
+    vulnerabilities = []
+    seen = set()
+    for rule, sink in hits:
+        if rule in seen:
+            continue
+        seen.add(rule)
+        cwe, severity, description = RULES[rule]
+        vulnerabilities.append(Vulnerability(
+            cwe=cwe,
+            description=f"[rule {rule}] {description.format(sink=f'`{sink}`')}",
+            severity=severity,
+        ))
+    return vulnerabilities
+
+
+def needs_review(unit: CodeUnit, code: str, findings: List[Vulnerability], decorators: str = '') -> bool:
+    """True se a unidade deve ir para o LLM: teve achados locais ou lida com entrada externa.
+
+    `decorators` é o texto dos decoradores da unidade (ver `ArtifactStore.decorators`):
+    um handler de rota recebe entrada externa pelos parâmetros, mesmo sem tocar em `request`.
+    """
+    code = outline_code(code) if unit['unit_type'] == 'class' else code
+    return bool(findings) or bool(UNTRUSTED_INPUT.search(decorators + code))
+
+
+def merge_findings(preliminary: List[Vulnerability], reviewed: List[Vulnerability]) -> List[Vulnerability]:
+    """Achados do LLM mais os preliminares cuja CWE o LLM não relatou."""
+    reported = {vulnerability['cwe'] for vulnerability in reviewed}
+    return reviewed + [vulnerability for vulnerability in preliminary if vulnerability['cwe'] not in reported]
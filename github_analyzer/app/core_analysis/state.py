@@ -2,6 +2,22 @@ import operator
 from typing import TypedDict, List, Dict, Optional
 from typing_extensions import Annotated
 
+# Valor de `error` no estado inicial de cada execução: apaga o erro de execuções anteriores da mesma thread
+CLEAR_ERROR = "\0clear"
+ERROR_SEPARATOR = "; "
+
+def keep_error(current: Optional[str], update: Optional[str]) -> Optional[str]:
+    """Reducer de `error`: ramos paralelos acumulam erros distintos; CLEAR_ERROR zera o acumulado."""
+    if update == CLEAR_ERROR:
+        return None
+    if not update:
+        return current
+    errors = current.split(ERROR_SEPARATOR) if current else []
+    for error in update.split(ERROR_SEPARATOR):
+        if error not in errors:
+            errors.append(error)
+    return ERROR_SEPARATOR.join(errors)
+
 class DocumentationScore(TypedDict):
     """Estrutura para armazenar a pontuação da documentação existente."""
     score: float  # Pontuação normalizada de 0.0 a 1.0
@@ -15,12 +31,29 @@ class Vulnerability(TypedDict):
 
 class CodeUnit(TypedDict):
     """Representa uma unidade de código atômica (função, classe, etc.)."""
-    file_path: str
+    file_path: str  # Caminho relativo à raiz do repositório
+    language: str  # Linguagem detectada pela extensão do arquivo
     unit_name: str
     unit_type: str  # 'function', 'class', 'endpoint'
-    raw_code: str
-    documentation: Optional[str]  # Documentação gerada pela IA
+    start_byte: int  # Intervalo de bytes da unidade no arquivo; o código é lido sob demanda (ver core_analysis/artifacts.py)
+    end_byte: int
+    decorator_start_byte: int  # Início dos decoradores Python da unidade (igual a start_byte se não houver)
+    code_hash: str  # SHA-256 do código-fonte da unidade, com os decoradores
+    fingerprint: str  # SHA-256 da árvore sintática normalizada (ver core_analysis/fingerprint.py)
+    complexity: int  # Complexidade ciclomática aproximada, usada no roteamento de modelos
+    documentation_ref: Optional[str]  # Referência para a documentação gerada pela IA no ArtifactStore do job
     vulnerabilities: List[Vulnerability]
+    from_index: bool  # True quando documentação e vulnerabilidades vieram do índice incremental ou de uma unidade equivalente
+    security_checked: bool  # True quando as vulnerabilidades já foram analisadas (ex.: no modo em lote)
+
+class FileEntry(TypedDict):
+    """Um arquivo do worktree, registrado uma única vez pelo agente de manifesto."""
+    path: str  # Caminho relativo à raiz do repositório
+    size: int
+    extension: str  # Extensão em minúsculas, com o ponto ('' se não houver)
+    blob_sha: str  # SHA do blob no git (`git ls-files -s`)
+    binary: bool
+    generated: bool  # Minificados, lockfiles, código gerado (marcadores como "@generated")
 
 class CommitInfo(TypedDict):
     """Informações sobre um commit recente."""
@@ -28,11 +61,20 @@ class CommitInfo(TypedDict):
     author: str
     message: str
     summary_of_changes: str
+    files_changed: int  # Estatísticas locais de `git log --numstat`
+    insertions: int
+    deletions: int
 
 class AgentState(TypedDict):
     """O estado central que flui através do grafo de agentes."""
     repo_url: str
+    commit_hash: str
+    base_commit: Optional[str]  # Commit anterior ao push (campo `before` do webhook)
     clone_path: str
+    manifest: List[FileEntry]  # Arquivos do worktree, sem os ignorados (.gitignore e MANIFEST_IGNORED_DIRS)
+    # Arquivos alterados desde o último commit indexado; None força a análise completa
+    changed_files: Optional[List[str]]
+    file_hashes: Dict[str, str]  # Caminho relativo -> SHA do blob no git
     language: str
     framework: str
     existing_doc_score: Optional[DocumentationScore]
@@ -40,6 +82,10 @@ class AgentState(TypedDict):
     commit_analysis: List[CommitInfo]
     final_report: str
     
+    # Tempo de parede, chamadas ao LLM e tokens de cada nó executado (ver utils/metrics.instrument_node)
+    timings: Annotated[List[dict], operator.add]
+
     # Lista cumulativa de logs ou erros
     processing_log: Annotated[List[str], operator.add]
-    error: Optional[str]
+    # `str` (e não Optional) para o canal começar em "" e o reducer receber já o CLEAR_ERROR da entrada
+    error: Annotated[str, keep_error]
@@ -0,0 +1,167 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app.config import settings
+from app.core_analysis.state import CodeUnit
+
+
+class UnitIndex:
+    """Índice persistente das unidades de código já analisadas, por repositório.
+
+    Cada arquivo é guardado com o SHA do seu blob no git e a lista de unidades
+    extraídas (com documentação e vulnerabilidades). A análise incremental
+    reaproveita essas entradas para os arquivos e unidades que não mudaram.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS index_repos (
+                repo TEXT PRIMARY KEY,
+                commit_hash TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS index_files (
+                repo TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                units TEXT NOT NULL,
+                PRIMARY KEY (repo, file_path)
+            );
+            CREATE TABLE IF NOT EXISTS unit_fingerprints (
+                fingerprint TEXT PRIMARY KEY,
+                documentation TEXT NOT NULL,
+                vulnerabilities TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS commit_summaries (
+                commit_hash TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            """
+        )
+
+    def get_commit(self, repo: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT commit_hash FROM index_repos WHERE repo = ?", (repo,)).fetchone()
+        return row[0] if row else None
+
+    def get_file_hashes(self, repo: str) -> Dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_path, file_hash FROM index_files WHERE repo = ?", (repo,)
+            ).fetchall()
+        return dict(rows)
+
+    def iter_units(self, repo: str, file_paths: Iterable[str]) -> Iterator[Tuple[str, List[CodeUnit]]]:
+        """(arquivo, unidades) dos arquivos indexados do repositório, em consultas de até 500 arquivos."""
+        unique = list(dict.fromkeys(file_paths))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT file_path, units FROM index_files WHERE repo = ? AND file_path IN ({placeholders})",
+                    [repo, *chunk],
+                ).fetchall()
+            # Decoded one file at a time, so the caller can drop each file's texts before the next
+            for file_path, units in rows:
+                yield file_path, json.loads(units)
+
+    def get_by_fingerprints(self, fingerprints: List[str]) -> Dict[str, dict]:
+        """Documentação e vulnerabilidades já geradas para unidades equivalentes, em qualquer repositório."""
+        results = {}
+        unique = list(dict.fromkeys(fingerprints))
+        # Stays below SQLite's limit of bound parameters per statement
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT fingerprint, documentation, vulnerabilities FROM unit_fingerprints WHERE fingerprint IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+            for fingerprint, documentation, vulnerabilities in rows:
+                results[fingerprint] = {'documentation': documentation, 'vulnerabilities': json.loads(vulnerabilities)}
+        return results
+
+    def put_fingerprints(self, code_units: Iterable[CodeUnit]):
+        """Grava o resultado das unidades analisadas, compartilhado por todos os jobs e repositórios.
+
+        `code_units` é consumido em sequência, então pode ser um gerador.
+        """
+        now = time.time()
+        rows = (
+            (unit['fingerprint'], unit['documentation'], json.dumps(unit['vulnerabilities'], ensure_ascii=False), now)
+            for unit in code_units
+        )
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO unit_fingerprints (fingerprint, documentation, vulnerabilities, created_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def get_commit_summaries(self, commit_hashes: List[str]) -> Dict[str, str]:
+        """Resumos já gerados; commits são imutáveis, então a memória por SHA é permanente."""
+        if not commit_hashes:
+            return {}
+        placeholders = ",".join("?" * len(commit_hashes))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT commit_hash, summary FROM commit_summaries WHERE commit_hash IN ({placeholders})",
+                commit_hashes,
+            ).fetchall()
+        return dict(rows)
+
+    def put_commit_summaries(self, summaries: Dict[str, str]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO commit_summaries (commit_hash, summary, created_at) VALUES (?, ?, ?)",
+                [(commit_hash, summary, now) for commit_hash, summary in summaries.items()],
+            )
+
+    def replace(self, repo: str, commit_hash: str, file_hashes: Dict[str, str], code_units: Iterable[CodeUnit]):
+        """Substitui o snapshot do repositório pelo resultado da análise de `commit_hash`.
+
+        `code_units` vem agrupado por arquivo, na ordem do estado, e é consumido
+        em sequência: com um gerador, só as unidades de um arquivo ficam em memória.
+        """
+        written = set()
+
+        def rows():
+            for path, units in groupby(code_units, key=itemgetter('file_path')):
+                written.add(path)
+                yield repo, path, file_hashes.get(path, ""), json.dumps(list(units), ensure_ascii=False)
+            # Files without units are indexed too, so they are not parsed again
+            for path in file_hashes.keys() - written:
+                yield repo, path, file_hashes[path], "[]"
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM index_files WHERE repo = ?", (repo,))
+                self._conn.executemany(
+                    "INSERT INTO index_files (repo, file_path, file_hash, units) VALUES (?, ?, ?, ?)", rows()
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO index_repos (repo, commit_hash, updated_at) VALUES (?, ?, ?)",
+                    (repo, commit_hash, time.time()),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+unit_index = UnitIndex(os.path.join(settings.data_dir, "unit_index.sqlite3"))
@@ -3,7 +3,8 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from starlette.middleware.sessions import SessionMiddleware
-from app.api import auth, repositories, webhooks
+from app.api import auth, jobs, metrics, repositories, webhooks
+from app.api.auth import current_user
 from app.config import settings
 
 app = FastAPI(title="GitHub Analyzer", description="Análise inteligente de repositórios GitHub")
@@ -23,11 +24,14 @@ templates = Jinja2Templates(directory="app/templates")
 app.include_router(auth.router, prefix="/api", tags=["auth"])
 app.include_router(repositories.router, prefix="/api", tags=["repositories"])
 app.include_router(webhooks.router, prefix="/api", tags=["webhooks"])
+app.include_router(jobs.router, prefix="/api", tags=["jobs"])
+# Raspado pelo Prometheus na raiz, sem sessão
+app.include_router(metrics.router, tags=["metrics"])
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Página inicial - verifica se usuário está autenticado"""
-    user = request.session.get('user')
+    user = await current_user(request)
     if user:
         return templates.TemplateResponse("dashboard.html", {"request": request, "user": user})
     return templates.TemplateResponse("login.html", {"request": request})
@@ -35,7 +39,7 @@ async def home(request: Request):
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(request: Request):
     """Dashboard principal com lista de repositórios"""
-    user = request.session.get('user')
+    user = await current_user(request)
     if not user:
         return templates.TemplateResponse("login.html", {"request": request})
     return templates.TemplateResponse("dashboard.html", {"request": request, "user": user})
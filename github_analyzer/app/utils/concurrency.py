@@ -0,0 +1,45 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def gather_bounded(
+    func: Callable[[T], Awaitable[R]],
+    items: Sequence[T],
+    limit: int,
+    on_error: Optional[Callable[[T, BaseException], R]] = None,
+) -> List[R]:
+    """Executa `func(item)` para cada item com no máximo `limit` chamadas em voo.
+
+    Os resultados são devolvidos na mesma ordem de `items`. Uma falha em um item
+    não interrompe os demais: se `on_error` for informado, seu retorno ocupa a
+    posição do item que falhou; caso contrário a exceção é propagada ao final.
+    """
+    results: List[Optional[R]] = [None] * len(items)
+    errors: List[BaseException] = []
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < len(items):
+            index = next_index
+            next_index += 1
+            item = items[index]
+            try:
+                results[index] = await func(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if on_error is None:
+                    errors.append(e)
+                else:
+                    results[index] = on_error(item, e)
+
+    workers = min(max(1, limit), len(items))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+    if errors:
+        raise errors[0]
+    return results
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from app.config import settings
+from app.utils.concurrency import gather_bounded
+
+try:
+    import h2  # noqa: F401  (habilita HTTP/2 no httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class GitHubRateLimited(Exception):
+    """A cota do token está esgotada por mais tempo do que o permitido esperar."""
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+class GitHubClient:
+    """Cliente da API REST do GitHub compartilhado pelo processo.
+
+    - Uma única conexão pooled (HTTP/2 quando o pacote `h2` está instalado).
+    - Requisições condicionais: GETs repetem o ETag em `If-None-Match`; respostas
+      304 não consomem a cota de rate limit e reutilizam o corpo em cache.
+    - Paginação completa: as páginas indicadas pelo cabeçalho `Link` são buscadas em paralelo.
+    - Acompanha `X-RateLimit-*` por token e espera (ou respeita `Retry-After`) antes de repetir.
+    """
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            base_url=settings.github_api_url,
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            timeout=httpx.Timeout(15.0, connect=5.0),
+            headers={
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+                "User-Agent": "github-analyzer",
+            },
+        )
+        # (token, url) -> (etag, corpo JSON, links), em ordem LRU
+        self._etags: "OrderedDict[Tuple[str, str], Tuple[str, Any, dict]]" = OrderedDict()
+        # token -> (requisições restantes, epoch de reset)
+        self._rate_limits: Dict[str, Tuple[int, float]] = {}
+
+    def _track_rate_limit(self, key: str, response: httpx.Response):
+        remaining = response.headers.get("x-ratelimit-remaining")
+        reset = response.headers.get("x-ratelimit-reset")
+        if remaining is not None and reset is not None:
+            self._rate_limits[key] = (int(remaining), float(reset))
+
+    async def _wait_for_rate_limit(self, key: str):
+        remaining, reset = self._rate_limits.get(key, (1, 0.0))
+        wait = reset - time.time()
+        if remaining > 0 or wait <= 0:
+            return
+        if wait > settings.github_rate_limit_max_wait_seconds:
+            raise GitHubRateLimited(f"GitHub rate limit resets in {int(wait)}s")
+        print(f"GitHub rate limit exhausted, waiting {wait:.0f}s for reset.")
+        await asyncio.sleep(wait)
+
+    def _retry_delay(self, key: str, response: httpx.Response, attempt: int) -> Optional[float]:
+        """Espera antes de repetir a requisição, ou None se a resposta não deve ser repetida."""
+        limited = response.status_code == 403 and (
+            response.headers.get("x-ratelimit-remaining") == "0" or "retry-after" in response.headers
+        )
+        if response.status_code not in RETRY_STATUSES and not limited:
+            return None
+        if "retry-after" in response.headers:
+            delay = float(response.headers["retry-after"])
+        elif response.headers.get("x-ratelimit-remaining") == "0":
+            delay = self._rate_limits.get(key, (0, time.time()))[1] - time.time()
+        else:
+            delay = 2 ** attempt + random.random()
+        return max(delay, 0.0)
+
+    async def request(self, method: str, path: str, token: str, params: Optional[dict] = None, json: Any = None) -> Tuple[Any, dict]:
+        """Executa a requisição e devolve (corpo JSON, links do cabeçalho `Link`)."""
+        key = _token_key(token)
+        url = str(self.client.build_request(method, path, params=params).url)
+        headers = {"Authorization": f"Bearer {token}"}
+        cached = self._etags.get((key, url)) if method == "GET" else None
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        for attempt in range(settings.github_max_retries + 1):
+            await self._wait_for_rate_limit(key)
+            response = await self.client.request(method, path, params=params, json=json, headers=headers)
+            self._track_rate_limit(key, response)
+
+            if response.status_code == 304 and cached:
+                self._etags.move_to_end((key, url))
+                return cached[1], cached[2]
+
+            delay = self._retry_delay(key, response, attempt)
+            if delay is None or attempt == settings.github_max_retries or delay > settings.github_rate_limit_max_wait_seconds:
+                break
+            await asyncio.sleep(delay)
+
+        response.raise_for_status()
+        data = response.json() if response.content else None
+        links = {rel: link["url"] for rel, link in response.links.items()}
+        if method == "GET" and "etag" in response.headers:
+            self._etags[(key, url)] = (response.headers["etag"], data, links)
+            self._etags.move_to_end((key, url))
+            while len(self._etags) > settings.github_etag_cache_entries:
+                self._etags.popitem(last=False)
+        return data, links
+
+    async def get(self, path: str, token: str, params: Optional[dict] = None) -> Any:
+        data, _ = await self.request("GET", path, token, params=params)
+        return data
+
+    async def post(self, path: str, token: str, json: Any = None) -> Any:
+        data, _ = await self.request("POST", path, token, json=json)
+        return data
+
+    async def paginate(self, path: str, token: str, params: Optional[dict] = None) -> List[Any]:
+        """Todos os itens de um endpoint paginado; as páginas após a primeira são buscadas em paralelo."""
+        params = {"per_page": 100, **(params or {})}
+        items, links = await self.request("GET", path, token, params=params)
+        items = list(items)
+
+        if "last" in links:
+            last_page = int(parse_qs(urlparse(links["last"]).query)["page"][0])
+            pages = await gather_bounded(
+                lambda page: self.get(path, token, params={**params, "page": page}),
+                list(range(2, last_page + 1)),
+                limit=settings.github_page_concurrency,
+            )
+            for page in pages:
+                items.extend(page)
+            return items
+
+        # Cursor-based endpoints only expose `next`
+        while "next" in links:
+            page, links = await self.request("GET", links["next"], token)
+            items.extend(page)
+        return items
+
+    async def list_user_repos(self, token: str) -> List[dict]:
+        return await self.paginate("/user/repos", token, params={"sort": "updated"})
+
+    async def create_hook(self, token: str, owner: str, repo: str, hook_data: dict) -> dict:
+        return await self.post(f"/repos/{owner}/{repo}/hooks", token, json=hook_data)
+
+
+github_client = GitHubClient()
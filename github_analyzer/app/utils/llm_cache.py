@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+from app.utils.metrics import LLM_CACHE_LOOKUPS
+
+
+def make_cache_key(model: str, messages: list, temperature: float, max_tokens: int) -> str:
+    """Gera a chave (SHA-256) de uma requisição de chat a partir dos parâmetros que afetam a resposta."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Cache persistente de respostas do LLM endereçado por conteúdo.
+
+    Fica em um arquivo SQLite em modo WAL para que todos os workers do gunicorn
+    compartilhem as mesmas entradas. As entradas expiram por idade e, quando o
+    tamanho total passa de `max_bytes`, as menos acessadas recentemente são removidas.
+    """
+
+    EVICT_EVERY = 100  # Gravações entre duas passagens de expiração
+
+    def __init__(self, path: str, max_bytes: int, max_age_seconds: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        self.evict()
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                LLM_CACHE_LOOKUPS.inc(result="miss")
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        LLM_CACHE_LOOKUPS.inc(result="hit")
+        return json.loads(row[0])
+
+    def set(self, key: str, response: dict):
+        data = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            self._writes += 1
+            should_evict = self._writes % self.EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """Remove entradas expiradas e, se necessário, as menos usadas até caber em `max_bytes`."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.max_age_seconds,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            excess = total - self.max_bytes
+            cursor = self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at ASC")
+            stale_keys = []
+            for key, size in cursor:
+                stale_keys.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", stale_keys)
@@ -0,0 +1,243 @@
+import asyncio
+import collections
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+from app.utils.metrics import LLM_RETRIES
+
+try:
+    import h2  # noqa: F401  (habilita HTTP/2 no httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+OVERLOAD_STATUSES = {429}
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Exception):
+    """A API falhou seguidamente; as requisições são recusadas até o fim do intervalo de espera."""
+
+
+class AIMDLimiter:
+    """Limite de requisições em voo com aumento aditivo e redução multiplicativa (AIMD).
+
+    Cada resposta bem-sucedida aumenta o limite em 1/limite (cerca de +1 a cada
+    janela completa); um 429 o multiplica por `decrease`, no máximo uma vez por
+    janela, para que uma rajada de 429 da mesma leva não derrube o limite ao mínimo.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self._waiters: "collections.deque[asyncio.Future]" = collections.deque()
+        self._sequence = 0  # Requisições iniciadas
+        self._last_decrease = 0  # Valor de `_sequence` na última redução
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self) -> int:
+        """Espera por uma vaga; devolve o número de sequência da requisição."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self.release()
+                raise
+        self._sequence += 1
+        return self._sequence
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_overload(self, sequence: int):
+        # Requests started before the last decrease saw the old limit; they don't count again
+        if sequence <= self._last_decrease:
+            return
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        self._last_decrease = self._sequence
+        print(f"LLM API overloaded, concurrency limit lowered to {int(self.limit)}.")
+
+
+class CircuitBreaker:
+    """Abre após `threshold` falhas seguidas (5xx, timeouts, erros de conexão).
+
+    Aberto, recusa requisições por `reset_seconds`; depois deixa passar uma
+    requisição de teste (meio aberto) e fecha no primeiro sucesso.
+    """
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    def before_request(self) -> bool:
+        """Recusa a requisição com o circuito aberto; devolve True se ela é a requisição de teste."""
+        if self.opened_at is None:
+            return False
+        if time.monotonic() - self.opened_at < self.reset_seconds or self._probing:
+            raise CircuitOpen(f"LLM API circuit open after {self.failures} consecutive failures")
+        self._probing = True
+        return True
+
+    def end_probe(self):
+        """Chamado ao fim da requisição de teste; sem resultado registrado (cancelada, erro inesperado) conta como falha."""
+        if self._probing:
+            self.record_failure()
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.threshold:
+            if self.opened_at is None:
+                print(f"LLM API failed {self.failures} times in a row, opening circuit for {self.reset_seconds}s.")
+            self.opened_at = time.monotonic()
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Espera pedida pelo servidor (`retry-after-ms` da OpenAI ou `Retry-After` em segundos/data HTTP)."""
+    if "retry-after-ms" in response.headers:
+        try:
+            return float(response.headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class LLMTransport:
+    """Transporte HTTP do OpenAIClient.
+
+    - Conexões pooled (HTTP/2 quando o pacote `h2` está instalado), com limites e timeouts explícitos.
+    - Repetição de 408/429/5xx, timeouts e erros de conexão com backoff exponencial com jitter,
+      respeitando `Retry-After`.
+    - Circuit breaker para não insistir em uma API fora do ar.
+    - Limitador AIMD: cresce o número de requisições em voo até aparecerem 429 e então recua.
+    """
+
+    def __init__(self, base_url: str, api_key: str):
+        self.base_url = base_url.rstrip("/")
+        self.client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_connections,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(settings.llm_timeout_seconds, connect=settings.llm_connect_timeout_seconds),
+        )
+        self.limiter = AIMDLimiter(
+            settings.llm_concurrency_initial, settings.llm_concurrency_min, settings.llm_concurrency_max
+        )
+        self.breaker = CircuitBreaker(settings.llm_circuit_failure_threshold, settings.llm_circuit_reset_seconds)
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        requested = retry_after_seconds(response) if response is not None else None
+        if requested is not None:
+            # A little jitter keeps the requests told to wait the same time from coming back together
+            return requested + random.uniform(0, settings.llm_backoff_base_seconds)
+        # Full jitter
+        return random.uniform(0, min(settings.llm_backoff_max_seconds, settings.llm_backoff_base_seconds * 2 ** attempt))
+
+    def _record(self, response: httpx.Response, sequence: int):
+        if response.status_code in OVERLOAD_STATUSES:
+            # Rate limited, but reachable: the limiter backs off and the circuit stays closed
+            self.limiter.on_overload(sequence)
+            self.breaker.record_success()
+        elif response.status_code >= 500 or response.status_code == 408:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+            if response.is_success:
+                self.limiter.on_success()
+
+    @asynccontextmanager
+    async def stream(self, path: str, json: dict):
+        """Abre a requisição e entrega a resposta, repetindo as falhas transitórias antes do primeiro byte do corpo.
+
+        A vaga do limitador fica ocupada enquanto o corpo é lido. Esgotadas as
+        tentativas, a última resposta é entregue como veio (cabe ao chamador `raise_for_status()`).
+        """
+        url = f"{self.base_url}{path}"
+        for attempt in range(settings.llm_max_retries + 1):
+            last_attempt = attempt == settings.llm_max_retries
+            probe = self.breaker.before_request()
+            try:
+                sequence = await self.limiter.acquire()
+                delivered = False
+                try:
+                    async with self.client.stream("POST", url, json=json) as response:
+                        self._record(response, sequence)
+                        retry = response.status_code in RETRY_STATUSES and not last_attempt
+                        if retry:
+                            delay = self._backoff(attempt, response)
+                            retry = delay <= settings.llm_retry_max_wait_seconds
+                        if not retry:
+                            delivered = True
+                            yield response
+                            return
+                        await response.aread()
+                        reason = str(response.status_code)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if delivered:
+                        raise
+                    self.breaker.record_failure()
+                    if last_attempt:
+                        raise
+                    delay = self._backoff(attempt, None)
+                    reason = "timeout" if isinstance(e, httpx.TimeoutException) else "transport"
+                finally:
+                    self.limiter.release()
+            finally:
+                if probe:
+                    # Otherwise a probe cancelled or failing in an unexpected way would keep the circuit open for good
+                    self.breaker.end_probe()
+
+            LLM_RETRIES.inc(reason=reason)
+            await asyncio.sleep(delay)
+
+    async def post(self, path: str, json: dict) -> httpx.Response:
+        """POST com as mesmas regras de `stream`, com o corpo já lido."""
+        async with self.stream(path, json) as response:
+            await response.aread()
+            return response
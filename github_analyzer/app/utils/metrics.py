@@ -0,0 +1,239 @@
+"""Métricas no formato de texto do Prometheus, agregadas entre processos.
+
+Cada processo (web e workers) acumula incrementos em memória e os soma
+periodicamente em DATA_DIR/metrics.sqlite3 com `flush()`; o endpoint
+/metrics do FastAPI lê o total de todos os processos a partir desse arquivo.
+"""
+import contextvars
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from app.config import settings
+
+SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+LLM_SECONDS_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    def escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{key}="{escape(labels[key])}"' for key in sorted(labels))
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._families: Dict[str, Tuple[str, str]] = {}  # nome -> (tipo, help)
+        # (nome da amostra, labels, le) -> incremento ainda não gravado
+        self._pending: Dict[Tuple[str, str, str], float] = {}
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS samples (
+                    name TEXT NOT NULL,
+                    labels TEXT NOT NULL,
+                    le TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (name, labels, le)
+                )
+                """
+            )
+        return self._conn
+
+    def counter(self, name: str, documentation: str) -> "Counter":
+        self._families[name] = ("counter", documentation)
+        return Counter(self, name)
+
+    def histogram(self, name: str, documentation: str, buckets=SECONDS_BUCKETS) -> "Histogram":
+        self._families[name] = ("histogram", documentation)
+        return Histogram(self, name, buckets)
+
+    def _add(self, name: str, labels: str, value: float, le: str = ""):
+        key = (name, labels, le)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0.0) + value
+
+    def flush(self):
+        """Soma os incrementos pendentes deste processo no arquivo compartilhado."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    """
+                    INSERT INTO samples (name, labels, le, value) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (name, labels, le) DO UPDATE SET value = value + excluded.value
+                    """,
+                    [(name, labels, le, value) for (name, labels, le), value in pending.items()],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                # Keep the increments for the next attempt
+                for key, value in pending.items():
+                    self._pending[key] = self._pending.get(key, 0.0) + value
+                raise
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, Dict[str, float]]]] = None) -> str:
+        """Texto de exposição do Prometheus com os totais de todos os processos.
+
+        `gauges` recebe valores instantâneos calculados no momento da coleta:
+        nome -> (help, {labels formatados: valor}).
+        """
+        self.flush()
+        with self._lock:
+            rows = self._connect().execute("SELECT name, labels, le, value FROM samples").fetchall()
+
+        samples: Dict[str, list] = {}
+        for name, labels, le, value in rows:
+            family = name
+            for suffix in ("_bucket", "_sum", "_count"):
+                if name.endswith(suffix) and name[:-len(suffix)] in self._families:
+                    family = name[:-len(suffix)]
+            if family in self._families:
+                samples.setdefault(family, []).append((name, labels, le, value))
+
+        lines = []
+        for family in sorted(samples):
+            metric_type, documentation = self._families[family]
+            lines.append(f"# HELP {family} {documentation}")
+            lines.append(f"# TYPE {family} {metric_type}")
+            ordered = sorted(samples[family], key=lambda s: (s[1], s[0] != f"{family}_bucket", float(s[2] or 0)))
+            for name, labels, le, value in ordered:
+                if le:
+                    labels = f'{labels},le="{le}"' if labels else f'le="{le}"'
+                lines.append(f"{name}{{{labels}}} {_format_value(value)}" if labels else f"{name} {_format_value(value)}")
+        for family, (documentation, values) in sorted((gauges or {}).items()):
+            lines.append(f"# HELP {family} {documentation}")
+            lines.append(f"# TYPE {family} gauge")
+            for labels, value in values.items():
+                lines.append(f"{family}{{{labels}}} {_format_value(value)}" if labels else f"{family} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    def __init__(self, registry: MetricsRegistry, name: str):
+        self.registry = registry
+        self.name = name
+
+    def inc(self, value: float = 1, **labels):
+        self.registry._add(self.name, _format_labels(labels), value)
+
+
+class Histogram:
+    def __init__(self, registry: MetricsRegistry, name: str, buckets):
+        self.registry = registry
+        self.name = name
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        formatted = _format_labels(labels)
+        for bound in self.buckets:
+            # Every bucket gets a sample, even with zero, so series exist for histogram_quantile
+            self.registry._add(f"{self.name}_bucket", formatted, 1 if value <= bound else 0, le=_format_value(bound))
+        self.registry._add(f"{self.name}_sum", formatted, value)
+        self.registry._add(f"{self.name}_count", formatted, 1)
+
+
+registry = MetricsRegistry(os.path.join(settings.data_dir, "metrics.sqlite3"))
+
+NODE_SECONDS = registry.histogram("analyzer_node_duration_seconds", "Wall time of each graph node.")
+STAGE_SECONDS = registry.histogram("analyzer_stage_duration_seconds", "Wall time of git and parsing stages inside nodes.")
+LLM_SECONDS = registry.histogram("analyzer_llm_request_duration_seconds", "Latency of LLM requests that reached the API.", LLM_SECONDS_BUCKETS)
+LLM_REQUESTS = registry.counter("analyzer_llm_requests_total", "LLM requests by outcome (ok, error, cache_hit).")
+LLM_CACHE_LOOKUPS = registry.counter("analyzer_llm_cache_lookups_total", "LLM response cache lookups by result (hit, miss).")
+LLM_RETRIES = registry.counter("analyzer_llm_retries_total", "LLM request attempts retried, by reason (status code, timeout, transport).")
+LLM_TOKENS = registry.counter("analyzer_llm_tokens_total", "LLM tokens reported in the response usage.")
+QUEUE_WAIT_SECONDS = registry.histogram("analyzer_job_queue_wait_seconds", "Time jobs spent queued before a worker claimed them.")
+JOB_SECONDS = registry.histogram("analyzer_job_duration_seconds", "Wall time of analysis jobs.")
+
+# Estatísticas do nó em execução, preenchidas pelo cliente do LLM (ver instrument_node)
+current_node_stats: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("current_node_stats", default=None)
+
+
+def record_llm_call(model: str, outcome: str, seconds: Optional[float] = None, usage: Optional[dict] = None):
+    LLM_REQUESTS.inc(model=model, outcome=outcome)
+    if seconds is not None:
+        LLM_SECONDS.observe(seconds, model=model)
+    usage = usage or {}
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            LLM_TOKENS.inc(tokens, model=model, kind=kind)
+
+    stats = current_node_stats.get()
+    if stats is not None:
+        stats["llm_calls"] += 1
+        stats["llm_cache_hits"] += outcome == "cache_hit"
+        stats["llm_errors"] += outcome == "error"
+        stats["llm_seconds"] += seconds or 0.0
+        stats["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        stats["completion_tokens"] += usage.get("completion_tokens") or 0
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    stats = current_node_stats.get()
+    if stats is not None:
+        stats["stages"][stage] = stats["stages"].get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Mede uma etapa interna de um nó (checkout, diff, parsing...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def instrument_node(name: str, node):
+    """Envolve um nó do grafo medindo o tempo e anexando um registro a `timings` no estado."""
+    async def run(state):
+        stats = {
+            "node": name,
+            "started_at": time.time(),
+            "seconds": 0.0,
+            "llm_calls": 0,
+            "llm_cache_hits": 0,
+            "llm_errors": 0,
+            "llm_seconds": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "stages": {},
+        }
+        token = current_node_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            update = await node(state)
+        finally:
+            current_node_stats.reset(token)
+            stats["seconds"] = round(time.perf_counter() - started, 3)
+            stats["llm_seconds"] = round(stats["llm_seconds"], 3)
+            stats["stages"] = {stage: round(seconds, 3) for stage, seconds in stats["stages"].items()}
+            NODE_SECONDS.observe(stats["seconds"], node=name)
+        update = dict(update or {})
+        update["timings"] = [stats]
+        return update
+    return run
@@ -1,5 +1,13 @@
-import httpx
+import asyncio
+import json
+import os
+import time
+from typing import Optional
 from app.config import settings
+from app.utils.llm_cache import LLMCache, make_cache_key
+from app.utils.llm_transport import LLMTransport
+from app.utils.metrics import record_llm_call
+from app.utils.tokens import PromptTooLarge, count_message_tokens, count_tokens, current_budget
 
 class OpenAIClient:
     def __init__(self):
@@ -7,20 +15,154 @@ class OpenAIClient:
         if not self.api_key:
             raise ValueError("OpenAI API key not found in settings")
         
-        self.base_url = "https://api.openai.com/v1"
-        self.client = httpx.AsyncClient(
-            headers={"Authorization": f"Bearer {self.api_key}"}
-        )
+        # Retries, circuit breaker and adaptive concurrency live in the transport
+        self.transport = LLMTransport(settings.openai_base_url, self.api_key)
+        self.cache = None
+        if settings.llm_cache_enabled:
+            self.cache = LLMCache(
+                os.path.join(settings.data_dir, "llm_cache.sqlite3"),
+                max_bytes=settings.llm_cache_max_bytes,
+                max_age_seconds=settings.llm_cache_max_age_seconds,
+            )
+
+    def _check_context(self, messages: list, max_tokens: int) -> int:
+        prompt_tokens = count_message_tokens(messages)
+        if prompt_tokens + max_tokens > settings.llm_context_window:
+            raise PromptTooLarge(
+                f"Request needs ~{prompt_tokens} prompt + {max_tokens} completion tokens, "
+                f"context window is {settings.llm_context_window}"
+            )
+        return prompt_tokens
+
+    def route(self, task: Optional[str], prompt_tokens: int, complexity: Optional[int] = None) -> str:
+        """Escolhe o modelo pela primeira regra de LLM_ROUTING_POLICY que se aplica à requisição."""
+        tier = settings.llm_default_tier
+        for rule in settings.llm_routing_policy:
+            if rule.get("task", task) != task:
+                continue
+            if "max_tokens" in rule and prompt_tokens > rule["max_tokens"]:
+                continue
+            if "max_complexity" in rule and complexity is not None and complexity > rule["max_complexity"]:
+                continue
+            tier = rule["tier"]
+            break
+        return settings.llm_model_tiers.get(tier, tier)
+
+    async def create_chat_completion(
+        self,
+        messages: list,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1500,
+        use_cache: bool = True,
+        task: Optional[str] = None,
+        complexity: Optional[int] = None,
+    ):
+        """Sem `model` explícito, o modelo é escolhido por `route` a partir da tarefa, do tamanho e da complexidade."""
+        prompt_tokens = self._check_context(messages, max_tokens)
+        model = model or self.route(task, prompt_tokens, complexity)
+
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = make_cache_key(model, messages, temperature, max_tokens)
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                record_llm_call(model, "cache_hit")
+                return cached
+
+        budget = current_budget.get()
+        if budget is not None:
+            budget.reserve(prompt_tokens)
 
-    async def create_chat_completion(self, model: str, messages: list, temperature: float = 0.7, max_tokens: int = 1500):
         data = {
             "model": model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
         }
-        response = await self.client.post(f"{self.base_url}/chat/completions", json=data)
-        response.raise_for_status()
-        return response.json()
+        started = time.perf_counter()
+        try:
+            response = await self.transport.post("/chat/completions", json=data)
+            response.raise_for_status()
+        except Exception:
+            record_llm_call(model, "error", time.perf_counter() - started)
+            raise
+        result = response.json()
+        record_llm_call(model, "ok", time.perf_counter() - started, result.get("usage"))
+
+        if budget is not None:
+            budget.add(result.get("usage", {}).get("completion_tokens", max_tokens))
+
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.set, cache_key, result)
+        return result
+
+    async def stream_chat_completion(
+        self,
+        messages: list,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1500,
+        use_cache: bool = True,
+        task: Optional[str] = None,
+        complexity: Optional[int] = None,
+    ):
+        """Async generator yielding content deltas as the server emits them (SSE)."""
+        prompt_tokens = self._check_context(messages, max_tokens)
+        model = model or self.route(task, prompt_tokens, complexity)
+
+        cache_key = None
+        if use_cache and self.cache is not None:
+            cache_key = make_cache_key(model, messages, temperature, max_tokens)
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached is not None:
+                record_llm_call(model, "cache_hit")
+                yield cached["choices"][0]["message"]["content"]
+                return
+
+        budget = current_budget.get()
+        if budget is not None:
+            budget.reserve(prompt_tokens)
+
+        data = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            # The final chunk then carries the token usage, like non-streamed responses
+            "stream_options": {"include_usage": True},
+        }
+        parts = []
+        usage = None
+        started = time.perf_counter()
+        try:
+            async with self.transport.stream("/chat/completions", json=data) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    chunk = json.loads(payload)
+                    usage = chunk.get("usage") or usage
+                    choices = chunk.get("choices") or []
+                    delta = choices[0].get("delta", {}).get("content") if choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        except Exception:
+            record_llm_call(model, "error", time.perf_counter() - started)
+            raise
+
+        content = "".join(parts)
+        record_llm_call(model, "ok", time.perf_counter() - started, usage)
+        if budget is not None:
+            budget.add((usage or {}).get("completion_tokens") or count_tokens(content))
+
+        if cache_key is not None:
+            result = {"choices": [{"message": {"role": "assistant", "content": content}}]}
+            await asyncio.to_thread(self.cache.set, cache_key, result)
 
 openai_client = OpenAIClient()
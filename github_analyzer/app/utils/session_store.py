@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from app.config import settings
+
+
+class SessionStore:
+    """Sessões do lado do servidor e cache por usuário em SQLite, compartilhados entre os workers do gunicorn.
+
+    O cookie guarda apenas o ID opaco da sessão; o token de acesso do GitHub e o
+    perfil ficam aqui. O cache por usuário (lista de repositórios, perfil) tem TTL:
+    entradas vencidas continuam sendo servidas enquanto são atualizadas em segundo
+    plano, de modo que o dashboard não espera pelo GitHub.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                access_token TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at);
+            CREATE TABLE IF NOT EXISTS user_cache (
+                user_id INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (user_id, key)
+            );
+            """
+        )
+        self._refreshing = set()  # (user_id, key) com atualização em segundo plano neste processo
+
+    def create(self, user_id: int, access_token: str) -> str:
+        session_id = secrets.token_urlsafe(32)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "INSERT INTO sessions (id, user_id, access_token, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, user_id, access_token, now, now + settings.session_ttl_seconds),
+            )
+        return session_id
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT user_id, access_token FROM sessions WHERE id = ? AND expires_at >= ?", (session_id, time.time())
+            ).fetchone()
+        return {"id": row[0], "access_token": row[1]} if row else None
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def get_cached(self, user_id: int, key: str) -> Optional[Tuple[Any, float]]:
+        """(valor, expires_at) ou None se nunca foi gravado."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM user_cache WHERE user_id = ? AND key = ?", (user_id, key)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def set_cached(self, user_id: int, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO user_cache (user_id, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (user_id, key, json.dumps(value), time.time() + ttl),
+            )
+
+    def invalidate(self, user_id: int, key: Optional[str] = None):
+        with self._lock:
+            if key is None:
+                self._conn.execute("DELETE FROM user_cache WHERE user_id = ?", (user_id,))
+            else:
+                self._conn.execute("DELETE FROM user_cache WHERE user_id = ? AND key = ?", (user_id, key))
+
+    async def cached(self, user_id: int, key: str, loader: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        """Valor em cache do usuário; carrega na primeira vez e atualiza em segundo plano quando vencido."""
+        entry = await asyncio.to_thread(self.get_cached, user_id, key)
+        if entry is None:
+            value = await loader()
+            await asyncio.to_thread(self.set_cached, user_id, key, value, ttl)
+            return value
+
+        value, expires_at = entry
+        if expires_at < time.time() and (user_id, key) not in self._refreshing:
+            self._refreshing.add((user_id, key))
+            asyncio.create_task(self._refresh(user_id, key, loader, ttl))
+        return value
+
+    async def _refresh(self, user_id: int, key: str, loader: Callable[[], Awaitable[Any]], ttl: float):
+        try:
+            value = await loader()
+            await asyncio.to_thread(self.set_cached, user_id, key, value, ttl)
+        except Exception as e:
+            print(f"Failed to refresh cached {key} for user {user_id}: {e}")
+        finally:
+            self._refreshing.discard((user_id, key))
+
+
+session_store = SessionStore(os.path.join(settings.data_dir, "sessions.sqlite3"))
@@ -0,0 +1,157 @@
+import contextvars
+import math
+import re
+from typing import List, Optional
+
+# Aproximação local da pré-tokenização BPE dos modelos da OpenAI (sem download de
+# vocabulário): palavras com o espaço anterior, números, sequências de pontuação e
+# quebras de linha. Palavras longas são divididas em pedaços de ~4 caracteres.
+_PIECE_RE = re.compile(r" ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+", re.UNICODE)
+
+MESSAGE_OVERHEAD_TOKENS = 4  # Tokens de formatação por mensagem de chat
+TRUNCATION_MARKER = "\n... [truncated] ...\n"
+
+
+class PromptTooLarge(ValueError):
+    """A requisição não cabe na janela de contexto do modelo."""
+
+
+class TokenBudgetExceeded(Exception):
+    """O job ultrapassou o teto de tokens configurado."""
+
+
+def _piece_tokens(piece: str) -> int:
+    stripped = piece.strip()
+    if not stripped:
+        return 1 if "\n" in piece else 0
+    if stripped[0].isalpha():
+        return max(1, math.ceil(len(stripped) / 4))
+    if stripped[0].isdigit():
+        return 1
+    return max(1, math.ceil(len(stripped) / 2))
+
+
+def count_tokens(text: str) -> int:
+    return sum(_piece_tokens(piece) for piece in _PIECE_RE.findall(text))
+
+
+def count_message_tokens(messages: list) -> int:
+    return sum(count_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS for message in messages) + 3
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = TRUNCATION_MARKER) -> str:
+    """Corta o texto no último pedaço que cabe em `max_tokens`."""
+    total = 0
+    for match in _PIECE_RE.finditer(text):
+        total += _piece_tokens(match.group())
+        if total > max_tokens:
+            return text[:match.start()] + marker
+    return text
+
+
+def truncate_middle(text: str, max_tokens: int) -> str:
+    """Mantém o começo e o fim do texto, removendo o meio."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    head = truncate_to_tokens(text, max_tokens * 2 // 3, marker="")
+    tail_lines: List[str] = []
+    tail_budget = max_tokens - count_tokens(head)
+    for line in reversed(text[len(head):].splitlines(keepends=True)):
+        tail_budget -= count_tokens(line)
+        if tail_budget < 0:
+            break
+        tail_lines.append(line)
+    return head + TRUNCATION_MARKER + "".join(reversed(tail_lines))
+
+
+def outline_code(code: str) -> str:
+    """Reduz uma classe às linhas do primeiro nível do corpo (assinaturas dos membros).
+
+    Os métodos já são unidades próprias, então a visão geral basta para a classe.
+    """
+    lines = code.splitlines()
+    body = [line for line in lines[1:] if line.strip()]
+    if not body:
+        return code
+    member_indent = min(len(line) - len(line.lstrip()) for line in body)
+    outline = [lines[0]]
+    elided = False
+    for line in lines[1:]:
+        indent = len(line) - len(line.lstrip())
+        if line.strip() and indent <= member_indent:
+            outline.append(line)
+            elided = False
+        elif line.strip() and not elided:
+            outline.append(" " * (member_indent + 4) + "...")
+            elided = True
+    return "\n".join(outline)
+
+
+def fit_code(code: str, unit_type: str, max_tokens: int) -> str:
+    """Ajusta o código de uma unidade ao orçamento: classe -> esboço dos membros, depois corte no meio."""
+    if count_tokens(code) <= max_tokens:
+        return code
+    if unit_type == "class":
+        code = outline_code(code)
+    return truncate_middle(code, max_tokens)
+
+
+def split_code(code: str, max_tokens: int) -> List[str]:
+    """Divide o código em blocos de linhas inteiras com no máximo `max_tokens` cada."""
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for line in code.splitlines(keepends=True):
+        tokens = count_tokens(line)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        if tokens > max_tokens:
+            line = truncate_to_tokens(line, max_tokens)
+            tokens = max_tokens
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def condense_markdown(text: str, max_tokens: int) -> str:
+    """Reduz um Markdown grande mantendo todos os títulos e o início de cada seção."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    sections: List[List[str]] = [[]]
+    for line in text.splitlines(keepends=True):
+        if line.lstrip().startswith("#") and sections[-1]:
+            sections.append([])
+        sections[-1].append(line)
+
+    per_section = max(20, max_tokens // len(sections))
+    condensed = [truncate_to_tokens("".join(section), per_section) for section in sections]
+    return truncate_to_tokens("".join(condensed), max_tokens)
+
+
+class TokenBudget:
+    """Teto de tokens (prompt + resposta) de um job de análise."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.limit - self.used
+
+    def reserve(self, tokens: int):
+        if self.limit and self.used + tokens > self.limit:
+            raise TokenBudgetExceeded(
+                f"Job token ceiling of {self.limit} reached ({self.used} used, {tokens} requested)"
+            )
+        self.used += tokens
+
+    def add(self, tokens: int):
+        self.used += tokens
+
+
+# Orçamento do job em execução; herdado pelas tasks criadas durante o pipeline
+current_budget: contextvars.ContextVar[Optional[TokenBudget]] = contextvars.ContextVar("current_budget", default=None)
@@ -0,0 +1,155 @@
+import fcntl
+import os
+import shutil
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+from git import Git, Repo
+from app.config import settings
+
+
+def repo_slug(repo_url: str) -> Tuple[str, str]:
+    """Extrai (owner, repo) de uma URL de clone do GitHub."""
+    path = urlparse(repo_url).path if "://" in repo_url else repo_url.split(":", 1)[-1]
+    parts = [part for part in path.strip("/").split("/") if part]
+    repo = parts[-1][:-4] if parts[-1].endswith(".git") else parts[-1]
+    owner = parts[-2] if len(parts) > 1 else "_"
+    return owner, repo
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class WorkspaceManager:
+    """Gerencia os espelhos bare por `owner/repo` e os worktrees de cada job.
+
+    O espelho é atualizado com `fetch` incremental e cada job recebe um
+    `git worktree` fixado no commit do push. Um `flock` por espelho serializa
+    atualizações (exclusivo) e o protege da remoção enquanto há worktrees em
+    uso (compartilhado). Espelhos menos usados recentemente são removidos
+    quando o total ultrapassa `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.mirrors_dir = os.path.join(root, "mirrors")
+        self.worktrees_dir = os.path.join(root, "worktrees")
+        self.max_bytes = max_bytes
+        self._held: Dict[str, int] = {}  # Worktree -> descritor do lock compartilhado do espelho
+        self._held_lock = threading.Lock()
+        os.makedirs(self.mirrors_dir, exist_ok=True)
+        os.makedirs(self.worktrees_dir, exist_ok=True)
+
+    def mirror_path(self, repo_url: str) -> str:
+        owner, repo = repo_slug(repo_url)
+        return os.path.join(self.mirrors_dir, owner, f"{repo}.git")
+
+    def worktree_path(self, repo_url: str, commit_hash: Optional[str]) -> str:
+        owner, repo = repo_slug(repo_url)
+        return os.path.join(self.worktrees_dir, f"{owner}__{repo}", commit_hash or "HEAD")
+
+    def _open_lock(self, mirror: str) -> int:
+        os.makedirs(os.path.dirname(mirror), exist_ok=True)
+        return os.open(f"{mirror}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+
+    def _update_mirror(self, repo_url: str, mirror: str):
+        if os.path.exists(os.path.join(mirror, "HEAD")):
+            print(f"Fetching {repo_url} into mirror {mirror}.")
+            Repo(mirror).git.fetch("--prune", "origin")
+        else:
+            print(f"Creating mirror of {repo_url} at {mirror}.")
+            shutil.rmtree(mirror, ignore_errors=True)
+            Git().clone("--mirror", repo_url, mirror)
+        os.utime(f"{mirror}.lock")  # Marca o uso para a política LRU
+
+    def checkout(self, repo_url: str, commit_hash: Optional[str] = None) -> str:
+        """Atualiza o espelho e cria um worktree fixado em `commit_hash` (ou no HEAD do espelho).
+
+        O espelho fica protegido por um lock compartilhado até `release()`.
+        """
+        mirror = self.mirror_path(repo_url)
+        worktree = self.worktree_path(repo_url, commit_hash)
+        with self._held_lock:
+            stale = self._held.pop(worktree, None)
+        if stale is not None:
+            os.close(stale)  # Nova tentativa do mesmo job neste processo
+        fd = self._open_lock(mirror)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self._update_mirror(repo_url, mirror)
+            mirror_repo = Repo(mirror)
+            if os.path.exists(worktree):
+                mirror_repo.git.worktree("remove", "--force", worktree)
+            mirror_repo.git.worktree("prune")
+            os.makedirs(os.path.dirname(worktree), exist_ok=True)
+            mirror_repo.git.worktree("add", "--detach", worktree, commit_hash or "HEAD")
+            fcntl.flock(fd, fcntl.LOCK_SH)
+        except Exception:
+            os.close(fd)
+            raise
+
+        with self._held_lock:
+            self._held[worktree] = fd
+        return worktree
+
+    def release(self, repo_url: str, commit_hash: Optional[str] = None):
+        """Remove o worktree do job, libera o espelho e aplica a cota de disco."""
+        mirror = self.mirror_path(repo_url)
+        worktree = self.worktree_path(repo_url, commit_hash)
+        with self._held_lock:
+            fd = self._held.pop(worktree, None)
+        if fd is None:
+            fd = self._open_lock(mirror)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.path.exists(worktree):
+                Repo(mirror).git.worktree("remove", "--force", worktree)
+            elif os.path.exists(mirror):
+                Repo(mirror).git.worktree("prune")
+        finally:
+            os.close(fd)
+        self.evict()
+
+    def evict(self):
+        """Remove os espelhos menos usados até o total caber em `max_bytes`.
+
+        Espelhos com worktrees em uso (lock compartilhado ativo) são ignorados.
+        """
+        mirrors = []
+        for owner in os.listdir(self.mirrors_dir):
+            owner_dir = os.path.join(self.mirrors_dir, owner)
+            if not os.path.isdir(owner_dir):
+                continue
+            for name in os.listdir(owner_dir):
+                path = os.path.join(owner_dir, name)
+                if name.endswith(".git") and os.path.isdir(path):
+                    lock_path = f"{path}.lock"
+                    last_used = os.path.getmtime(lock_path) if os.path.exists(lock_path) else 0
+                    mirrors.append((last_used, path, _dir_size(path)))
+
+        total = sum(size for _, _, size in mirrors)
+        for _, path, size in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            fd = self._open_lock(path)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            try:
+                print(f"Evicting mirror {path} ({size} bytes).")
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+            finally:
+                os.close(fd)
+
+
+workspace_manager = WorkspaceManager(settings.data_dir, settings.workspace_max_bytes)
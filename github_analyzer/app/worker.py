@@ -0,0 +1,196 @@
+"""Worker dedicado que drena a fila de análises.
+
+Uso: python -m app.worker
+"""
+import asyncio
+import os
+import socket
+import time
+from app.config import settings
+from app.core_analysis.artifacts import close_artifacts, get_artifacts, prune_artifacts
+from app.core_analysis.graph import (
+    can_resume, find_interrupted_threads, get_app, is_interrupted, prune_threads, thread_config
+)
+from app.core_analysis.job_queue import job_queue
+from app.core_analysis.state import CLEAR_ERROR, AgentState
+from app.utils.metrics import JOB_SECONDS, QUEUE_WAIT_SECONDS, registry
+from app.utils.tokens import TokenBudget, current_budget
+from app.utils.workspace import repo_slug, workspace_manager
+
+async def _stream_run(analysis_graph, graph_input, config, on_event):
+    """Executa o grafo repassando o progresso por nó e os tokens do relatório para `on_event`."""
+    final_state = None
+    report_buffer = []
+
+    async def flush_report():
+        if report_buffer:
+            await on_event("report_token", {"text": "".join(report_buffer)})
+            report_buffer.clear()
+
+    async for mode, chunk in analysis_graph.astream(graph_input, config=config, stream_mode=["tasks", "custom", "values"]):
+        if mode == "values":
+            final_state = chunk
+        elif mode == "custom" and isinstance(chunk, dict) and chunk.get("type") == "report_token":
+            # Coalesce deltas so a long report does not become thousands of events
+            report_buffer.append(chunk["text"])
+            if sum(len(text) for text in report_buffer) >= 200:
+                await flush_report()
+        elif mode == "tasks":
+            await flush_report()
+            if "result" in chunk:
+                timings = dict(chunk["result"] or {}).get("timings") or [{}]
+                await on_event("node_finished", {
+                    "node": chunk["name"],
+                    "error": chunk.get("error") and str(chunk["error"]),
+                    "seconds": timings[-1].get("seconds"),
+                })
+            else:
+                await on_event("node_started", {"node": chunk["name"]})
+    await flush_report()
+    return final_state
+
+async def run_analysis_pipeline(repo_url: str, commit_hash: str, base_commit: str = None, on_event=None):
+    initial_state = AgentState(
+        repo_url=repo_url,
+        commit_hash=commit_hash,
+        base_commit=base_commit,
+        clone_path="",
+        manifest=[],
+        changed_files=None,
+        file_hashes={},
+        language="",
+        framework="",
+        existing_doc_score=None,
+        code_units=[],
+        commit_analysis=[],
+        final_report="",
+        timings=[],
+        processing_log=[],
+        # The thread is keyed by commit: errors from an earlier run of it must not leak into this one
+        error=CLEAR_ERROR,
+    )
+    analysis_graph = await get_app()
+    config = thread_config(commit_hash)
+    budget = TokenBudget(settings.job_token_ceiling)
+    token = current_budget.set(budget if settings.job_token_ceiling else None)
+    try:
+        graph_input = initial_state
+        if await is_interrupted(commit_hash):
+            if await can_resume(commit_hash):
+                # Resume from the last completed node; the worktree path is deterministic, so recreate it
+                print(f"Resuming interrupted run for {commit_hash[:7]} from its last checkpoint.")
+                await asyncio.to_thread(workspace_manager.checkout, repo_url, commit_hash)
+                graph_input = None
+            else:
+                # Stopped before triage produced a worktree: resuming would only repeat the failure
+                print(f"Discarding interrupted run for {commit_hash[:7]}, which never checked out the repository.")
+                await prune_threads([commit_hash])
+        if on_event is None:
+            return await analysis_graph.ainvoke(graph_input, config=config)
+        return await _stream_run(analysis_graph, graph_input, config, on_event)
+    finally:
+        current_budget.reset(token)
+        print(f"Job {commit_hash[:7]} used ~{budget.used} LLM tokens.")
+
+class AnalysisWorker:
+    """Pool de slots assíncronos que reservam e executam jobs da fila."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(settings.job_lease_seconds / 3)
+            await asyncio.to_thread(job_queue.heartbeat, job_id)
+
+    async def _run_job(self, job: dict):
+        print(f"--- Worker {self.worker_id} starting job {job['id']} ({job['repo']}@{job['commit_hash'][:7]}) ---")
+        QUEUE_WAIT_SECONDS.observe(job['started_at'] - job['created_at'])
+        heartbeat = asyncio.create_task(self._heartbeat(job['id']))
+        started = time.perf_counter()
+        error = None
+
+        async def on_event(event_type: str, data: dict):
+            await asyncio.to_thread(job_queue.add_event, job['id'], event_type, data)
+
+        try:
+            await on_event("job_started", {"commit": job['commit_hash'], "worker": self.worker_id})
+            final_state = await run_analysis_pipeline(job['repo_url'], job['commit_hash'], job['base_commit'], on_event=on_event)
+            error = final_state.get('error')
+            if final_state.get('clone_path'):
+                # Texts reused without a rewrite must also survive prune_artifacts while this checkpoint lives
+                await asyncio.to_thread(get_artifacts(final_state).touch, final_state.get('code_units', []))
+        except Exception as e:
+            print(f"Job {job['id']} failed: {e}")
+            error = str(e)
+        finally:
+            heartbeat.cancel()
+            close_artifacts(workspace_manager.worktree_path(job['repo_url'], job['commit_hash']))
+            try:
+                await asyncio.to_thread(workspace_manager.release, job['repo_url'], job['commit_hash'])
+            except Exception as e:
+                print(f"Failed to release workspace for job {job['id']}: {e}")
+        JOB_SECONDS.observe(time.perf_counter() - started, status="failed" if error else "done")
+        # Written before the status flips so SSE clients always receive it before the stream closes
+        await on_event("job_finished", {"status": "failed" if error else "done", "error": error})
+        await asyncio.to_thread(job_queue.finish, job['id'], error)
+
+    async def _slot(self):
+        while True:
+            job = await asyncio.to_thread(job_queue.claim, self.worker_id)
+            if job is None:
+                await asyncio.sleep(settings.job_poll_interval_seconds)
+                continue
+            await self._run_job(job)
+
+    async def _recover(self):
+        """Reenfileira execuções interrompidas que perderam o job (ex.: banco da fila recriado).
+
+        Jobs ainda `queued` ou `running` retomam do checkpoint quando forem executados.
+        """
+        for commit_hash, repo_url in await find_interrupted_threads():
+            if not repo_url or await asyncio.to_thread(job_queue.get_by_commit, commit_hash):
+                continue
+            owner, repo = repo_slug(repo_url)
+            job_id = await asyncio.to_thread(job_queue.enqueue_if_idle, f"{owner}/{repo}", repo_url, commit_hash)
+            if job_id:
+                print(f"Recovered interrupted run {commit_hash[:7]} as job {job_id}.")
+
+    async def _prune_checkpoints(self):
+        cutoff = time.time() - settings.checkpoint_retention_seconds
+        commits = await asyncio.to_thread(job_queue.finished_commits, cutoff)
+        if commits:
+            await prune_threads(commits)
+        # Documentation texts are shared across commits; those no recent job touched have no checkpoint left
+        removed = await asyncio.to_thread(prune_artifacts, cutoff)
+        if removed:
+            print(f"Pruned {removed} unreferenced documentation artifacts.")
+
+    async def _reaper(self):
+        while True:
+            requeued = await asyncio.to_thread(job_queue.requeue_stale, settings.job_lease_seconds)
+            if requeued:
+                print(f"Requeued {requeued} interrupted jobs.")
+            try:
+                await self._prune_checkpoints()
+            except Exception as e:
+                print(f"Failed to prune checkpoints: {e}")
+            await asyncio.to_thread(job_queue.prune_events, time.time() - settings.job_event_retention_seconds)
+            await asyncio.sleep(settings.job_lease_seconds)
+
+    async def _flush_metrics(self):
+        while True:
+            await asyncio.sleep(settings.metrics_flush_seconds)
+            try:
+                await asyncio.to_thread(registry.flush)
+            except Exception as e:
+                print(f"Failed to flush metrics: {e}")
+
+    async def run(self):
+        print(f"--- Analysis worker {self.worker_id} running with {self.concurrency} slots ---")
+        await self._recover()
+        await asyncio.gather(self._reaper(), self._flush_metrics(), *(self._slot() for _ in range(self.concurrency)))
+
+if __name__ == "__main__":
+    asyncio.run(AnalysisWorker(settings.analysis_worker_concurrency).run())
@@ -0,0 +1,211 @@
+"""
+Servidor local que imita o endpoint /v1/chat/completions da OpenAI para benchmarks.
+
+As respostas são determinísticas (derivadas do hash do prompt) e reconhecem os
+prompts de cada agente, de modo que o pipeline percorre os mesmos caminhos que
+em produção. Latência, taxa de respostas 429 e limite de requisições simultâneas são configuráveis.
+
+Uso: python -m benchmarks.fake_openai --port 8089 --latency 0.3 --rate-429 0.05
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.utils.tokens import count_message_tokens, count_tokens
+
+VULNERABLE_PATTERNS = {
+    "os.system(": ("CWE-78", "User-controlled input reaches a shell command.", "High"),
+    "eval(": ("CWE-95", "Dynamic evaluation of untrusted input.", "High"),
+    "execute(\"SELECT": ("CWE-89", "SQL query built by string concatenation.", "Medium"),
+    "innerHTML": ("CWE-79", "Unescaped data written to the DOM.", "Medium"),
+}
+
+
+@dataclass
+class FakeConfig:
+    latency: float = 0.2  # Segundos por requisição
+    jitter: float = 0.1  # Variação máxima (fração da latência), determinística por prompt
+    seconds_per_token: float = 0.0  # Custo extra por token gerado
+    rate_429: float = 0.0  # Fração das primeiras tentativas respondidas com 429
+    retry_after: float = 1.0
+    max_concurrency: int = 0  # Requisições simultâneas acima disso recebem 429 (0 = sem limite)
+
+
+@dataclass
+class FakeStats:
+    requests: int = 0
+    rate_limited: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    attempts: Dict[str, int] = field(default_factory=dict)
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def _vulnerabilities(code: str) -> list:
+    return [
+        {"cwe": cwe, "description": description, "severity": severity}
+        for pattern, (cwe, description, severity) in VULNERABLE_PATTERNS.items()
+        if pattern in code
+    ]
+
+
+def _sentence(prompt: str, words: int) -> str:
+    vocabulary = ["module", "handles", "requests", "parses", "input", "returns", "data", "service",
+                  "configuration", "validates", "records", "user", "report", "process", "helper", "state"]
+    seed = _digest(prompt)
+    return " ".join(vocabulary[(seed >> (i % 60)) % len(vocabulary)] for i in range(words)).capitalize() + "."
+
+
+def canned_response(prompt: str, max_tokens: int) -> str:
+    """Resposta plausível para cada tipo de prompt do pipeline."""
+    if "CODE UNITS:" in prompt:
+        units = prompt.split("### UNIT ")[1:]
+        return json.dumps({"units": [
+            {"id": index, "documentation": _sentence(unit, 24), "vulnerabilities": _vulnerabilities(unit)}
+            for index, unit in enumerate(units)
+        ]})
+    if "COMMITS:" in prompt:
+        commits = prompt.split("### COMMIT ")[1:]
+        return json.dumps({"commits": [
+            {"id": index, "summary": _sentence(commit, 14)} for index, commit in enumerate(commits)
+        ]})
+    if "(Pentester)" in prompt:
+        return json.dumps(_vulnerabilities(prompt.split("CODE", 1)[-1]))
+    if "rubric" in prompt:
+        score = (_digest(prompt) % 100) / 100
+        return json.dumps({"score": score, "reasoning": _sentence(prompt, 20)})
+    if "docstring" in prompt:
+        return f"{_sentence(prompt, 12)}\n\n**Parâmetros:** {_sentence(prompt[::-1], 16)}\n\n**Retorno:** {_sentence(prompt[1:], 8)}"
+    # Resumos de módulos, sumário executivo
+    return _sentence(prompt, min(max_tokens // 2, 80))
+
+
+def create_app(config: FakeConfig, stats: FakeStats) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        key = hashlib.sha256(prompt.encode()).hexdigest()
+        stats.requests += 1
+
+        # Only first attempts are throttled, so a client that retries always gets through
+        attempt = stats.attempts.get(key, 0)
+        stats.attempts[key] = attempt + 1
+        if attempt == 0 and (_digest("429" + prompt) % 10_000) / 10_000 < config.rate_429:
+            stats.rate_limited += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)},
+            )
+
+        # Like a provider's concurrency limit: excess requests are rejected whatever the attempt
+        if config.max_concurrency and stats.in_flight >= config.max_concurrency:
+            stats.rate_limited += 1
+            return JSONResponse(
+                {"error": {"message": "Too many concurrent requests", "type": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)},
+            )
+
+        content = canned_response(prompt, body.get("max_tokens", 1500))
+        usage = {"prompt_tokens": count_message_tokens(messages), "completion_tokens": count_tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        stats.prompt_tokens += usage["prompt_tokens"]
+        stats.completion_tokens += usage["completion_tokens"]
+
+        jitter = config.latency * config.jitter * (((_digest(key) % 2001) - 1000) / 1000)
+        delay = max(0.0, config.latency + jitter) + config.seconds_per_token * usage["completion_tokens"]
+
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        if body.get("stream"):
+            async def events():
+                try:
+                    pieces = re.findall(r"\S+\s*", content) or [content]
+                    for piece in pieces:
+                        await asyncio.sleep(delay / len(pieces))
+                        chunk = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+                        yield f"data: {json.dumps(chunk)}\n\n"
+                    if (body.get("stream_options") or {}).get("include_usage"):
+                        yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+                    yield "data: [DONE]\n\n"
+                finally:
+                    stats.in_flight -= 1
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            stats.in_flight -= 1
+        return {
+            "id": f"chatcmpl-{key[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    return app
+
+
+class FakeOpenAIServer:
+    """Executa o servidor falso em uma thread própria, fora do event loop medido."""
+
+    def __init__(self, config: FakeConfig, host: str = "127.0.0.1", port: int = 8089):
+        self.stats = FakeStats()
+        self.url = f"http://{host}:{port}/v1"
+        self._server = uvicorn.Server(uvicorn.Config(
+            create_app(config, self.stats), host=host, port=port, log_level="warning", lifespan="off",
+        ))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso de chat completions para benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2, help="latência base por requisição, em segundos")
+    parser.add_argument("--jitter", type=float, default=0.1, help="variação da latência (fração)")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fração das requisições respondidas com 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--max-concurrency", type=int, default=0, help="requisições simultâneas antes de responder 429")
+    args = parser.parse_args()
+
+    config = FakeConfig(args.latency, args.jitter, args.seconds_per_token, args.rate_429, args.retry_after,
+                        args.max_concurrency)
+    uvicorn.run(create_app(config, FakeStats()), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
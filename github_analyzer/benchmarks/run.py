@@ -0,0 +1,297 @@
+"""
+Benchmark de ponta a ponta do pipeline de análise, sem rede e sem custo de API.
+
+Gera um repositório sintético, sobe o servidor falso da OpenAI e executa o grafo
+(`run_analysis_pipeline` -> `analysis_graph.ainvoke`) em subprocessos isolados,
+cada um com seu próprio DATA_DIR. Reporta tempo por nó, vazão, pico de RSS e
+tamanho do banco de checkpoints, e
+compara com um resultado anterior para detectar regressões.
+
+Uso (a partir de github_analyzer/):
+    python -m benchmarks.run --files 200 --latency 0.3 --runs 3 --output bench.json
+    python -m benchmarks.run --files 200 --latency 0.3 --runs 3 --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_openai import FakeConfig, FakeOpenAIServer
+from benchmarks.synthetic_repo import RepoSpec, generate_repo
+
+# Variáveis exigidas pelo Settings que não afetam o pipeline
+PLACEHOLDER_ENV = ("GITHUB_CLIENT_ID", "GITHUB_CLIENT_SECRET", "OPENAI_API_KEY", "GEMINI_API_KEY",
+                   "WEBHOOK_SECRET", "SESSION_SECRET_KEY")
+
+
+def _checkpoint_kb(path: str) -> float:
+    # Every node writes a full checkpoint, so this grows with what the state carries
+    size = sum(os.path.getsize(f"{path}{suffix}") for suffix in ("", "-wal") if os.path.exists(f"{path}{suffix}"))
+    return round(size / 1024, 1)
+
+
+def _peak_rss_mb() -> dict:
+    # ru_maxrss is in KiB on Linux; children covers the tree-sitter parsing pool
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+async def _child_run(repo_path: str, commit: str, passes: int) -> dict:
+    from app.core_analysis import graph
+    from app.worker import run_analysis_pipeline
+
+    final_state = None
+    started = started_at = 0.0
+    for _ in range(passes):
+        # With --warm only the last pass is measured: it re-analyzes on top of the index
+        started, started_at = time.perf_counter(), time.time()
+        final_state = await run_analysis_pipeline(f"file://{repo_path}", commit)
+    total_seconds = time.perf_counter() - started
+    await graph.close()
+
+    # The thread of a re-analyzed commit keeps the timings of earlier passes
+    nodes = {}
+    for record in final_state.get("timings", []):
+        if record["started_at"] < started_at:
+            continue
+        nodes[record["node"]] = {key: record[key] for key in ("seconds", "llm_calls", "llm_errors", "llm_seconds", "prompt_tokens", "completion_tokens")}
+        for stage, seconds in record.get("stages", {}).items():
+            nodes[record["node"]][f"stage_{stage}"] = seconds
+
+    units = final_state.get("code_units", [])
+    files = len({unit["file_path"] for unit in units})
+    return {
+        "total_seconds": round(total_seconds, 3),
+        "units": len(units),
+        "files": files,
+        "units_per_second": round(len(units) / total_seconds, 2) if total_seconds else None,
+        "files_per_second": round(files / total_seconds, 2) if total_seconds else None,
+        "llm_calls": sum(node["llm_calls"] for node in nodes.values()),
+        "llm_errors": sum(node["llm_errors"] for node in nodes.values()),
+        "prompt_tokens": sum(node["prompt_tokens"] for node in nodes.values()),
+        "completion_tokens": sum(node["completion_tokens"] for node in nodes.values()),
+        "error": final_state.get("error"),
+        "nodes": nodes,
+        "peak_rss_mb": _peak_rss_mb(),
+        "checkpoint_kb": _checkpoint_kb(graph.CHECKPOINT_DB),
+    }
+
+
+def child_main(args):
+    result = asyncio.run(_child_run(args.repo, args.commit, 2 if args.warm else 1))
+    with open(args.child_output, "w") as f:
+        json.dump(result, f)
+
+
+def run_once(repo_path: str, commit: str, env: dict, warm: bool, verbose: bool) -> dict:
+    data_dir = tempfile.mkdtemp(prefix="bench-data-")
+    output = os.path.join(data_dir, "result.json")
+    try:
+        command = [sys.executable, "-m", "benchmarks.run", "--child", "--repo", repo_path, "--commit", commit,
+                   "--child-output", output]
+        if warm:
+            command.append("--warm")
+        subprocess.run(
+            command,
+            env={**env, "DATA_DIR": data_dir},
+            check=True,
+            stdout=None if verbose else subprocess.DEVNULL,
+        )
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _median(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    median = round(statistics.median(values), 3)
+    return int(median) if all(isinstance(value, int) for value in values) and median == int(median) else median
+
+
+def aggregate(runs: list) -> dict:
+    """Mediana de cada métrica numérica entre as execuções."""
+    summary = {key: _median([run[key] for run in runs]) for key in (
+        "total_seconds", "units_per_second", "files_per_second", "llm_calls", "llm_errors",
+        "prompt_tokens", "completion_tokens", "checkpoint_kb")}
+    summary["units"] = runs[0]["units"]
+    summary["files"] = runs[0]["files"]
+    summary["peak_rss_mb"] = {
+        kind: _median([run["peak_rss_mb"][kind] for run in runs]) for kind in ("self", "children")
+    }
+    summary["nodes"] = {
+        node: {key: _median([run["nodes"].get(node, {}).get(key) for run in runs]) for key in metrics}
+        for node, metrics in runs[0]["nodes"].items()
+    }
+    summary["errors"] = sorted({run["error"] for run in runs if run["error"]})
+    return summary
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Lista de regressões (métricas de custo que cresceram mais que `threshold`)."""
+    pairs = [("total_seconds", current["total_seconds"], baseline["total_seconds"]),
+             ("peak_rss_mb.self", current["peak_rss_mb"]["self"], baseline["peak_rss_mb"]["self"]),
+             ("peak_rss_mb.children", current["peak_rss_mb"]["children"], baseline["peak_rss_mb"]["children"]),
+             ("checkpoint_kb", current["checkpoint_kb"], baseline.get("checkpoint_kb")),
+             ("llm_calls", current["llm_calls"], baseline["llm_calls"]),
+             ("prompt_tokens", current["prompt_tokens"], baseline["prompt_tokens"])]
+    for node, metrics in current["nodes"].items():
+        pairs.append((f"nodes.{node}.seconds", metrics.get("seconds"), baseline["nodes"].get(node, {}).get("seconds")))
+
+    lines, regressions = [], []
+    for name, now, before in pairs:
+        if now is None or not before:
+            continue
+        delta = (now - before) / before
+        flag = ""
+        # Sub-50ms nodes are dominated by noise
+        if delta > threshold and now - before > 0.05:
+            flag = "  <-- REGRESSION"
+            regressions.append(name)
+        lines.append(f"  {name:<40} {before:>10} -> {now:>10}  ({delta:+.1%}){flag}")
+    print("\nComparison with baseline:")
+    print("\n".join(lines))
+    return regressions
+
+
+def print_summary(summary: dict):
+    print(f"\nUnits: {summary['units']} in {summary['files']} files")
+    print(f"Total: {summary['total_seconds']}s  ({summary['units_per_second']} units/s, {summary['files_per_second']} files/s)")
+    print(f"LLM: {summary['llm_calls']} calls, {summary['llm_errors']} errors, "
+          f"{summary['prompt_tokens']} prompt / {summary['completion_tokens']} completion tokens")
+    print(f"Peak RSS: {summary['peak_rss_mb']['self']} MiB (pipeline), {summary['peak_rss_mb']['children']} MiB (largest child)")
+    print(f"Checkpoints: {summary['checkpoint_kb']} KiB")
+    print("\nPer node (median seconds; parallel branches overlap):")
+    for node, metrics in summary["nodes"].items():
+        stages = ", ".join(f"{key[6:]}={value}" for key, value in metrics.items() if key.startswith("stage_"))
+        print(f"  {node:<14} {metrics['seconds']:>8}s  llm={metrics['llm_calls']}" + (f"  [{stages}]" if stages else ""))
+    for error in summary["errors"]:
+        print(f"Pipeline error: {error}")
+
+
+def _analyzer_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline de análise")
+    repo = parser.add_argument_group("repositório sintético")
+    repo.add_argument("--files", type=int, default=RepoSpec.files)
+    repo.add_argument("--functions-per-file", type=int, default=RepoSpec.functions_per_file)
+    repo.add_argument("--classes-per-file", type=int, default=RepoSpec.classes_per_file)
+    repo.add_argument("--modules", type=int, default=RepoSpec.modules)
+    repo.add_argument("--languages", default=RepoSpec.languages, help="ex.: python=3,javascript=1,java=1")
+    repo.add_argument("--commits", type=int, default=RepoSpec.commits)
+    repo.add_argument("--vulnerable-ratio", type=float, default=RepoSpec.vulnerable_ratio)
+    repo.add_argument("--seed", type=int, default=RepoSpec.seed)
+    fake = parser.add_argument_group("servidor falso da OpenAI")
+    fake.add_argument("--latency", type=float, default=0.2)
+    fake.add_argument("--jitter", type=float, default=0.1)
+    fake.add_argument("--seconds-per-token", type=float, default=0.0)
+    fake.add_argument("--rate-429", type=float, default=0.0)
+    fake.add_argument("--retry-after", type=float, default=1.0)
+    fake.add_argument("--max-concurrency", type=int, default=0)
+    fake.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--runs", type=int, default=3, help="execuções medidas (é reportada a mediana)")
+    parser.add_argument("--warm", action="store_true", help="mede a reanálise do mesmo commit com o índice preenchido")
+    parser.add_argument("--llm-cache", action="store_true", help="mantém o cache de respostas do LLM ligado")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="sobrescreve uma configuração do Settings, ex.: --set LLM_BATCH_MODE=true")
+    parser.add_argument("--output", help="grava o resultado em JSON")
+    parser.add_argument("--compare", help="resultado JSON anterior para comparação")
+    parser.add_argument("--threshold", type=float, default=0.10, help="aumento relativo tratado como regressão")
+    parser.add_argument("--verbose", action="store_true", help="mostra a saída dos agentes")
+    # Internal: a measured run inside an isolated subprocess
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--repo", help=argparse.SUPPRESS)
+    parser.add_argument("--commit", help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child_main(args)
+        return
+
+    spec = RepoSpec(args.files, args.functions_per_file, args.classes_per_file, args.modules,
+                    args.languages, args.commits, args.vulnerable_ratio, args.seed)
+    fake_config = FakeConfig(args.latency, args.jitter, args.seconds_per_token, args.rate_429, args.retry_after,
+                             args.max_concurrency)
+    workdir = tempfile.mkdtemp(prefix="bench-repo-")
+    repo_path = os.path.join(workdir, "synthetic")
+
+    try:
+        print(f"Generating synthetic repository ({spec.files} files, {spec.commits} commits)...")
+        commit = generate_repo(repo_path, spec)
+
+        with FakeOpenAIServer(fake_config, port=args.port) as server:
+            env = dict(os.environ)
+            for name in PLACEHOLDER_ENV:
+                env.setdefault(name, "benchmark")
+            env["OPENAI_BASE_URL"] = server.url
+            env["LLM_CACHE_ENABLED"] = "true" if args.llm_cache else "false"
+            for assignment in args.set:
+                key, _, value = assignment.partition("=")
+                env[key.upper()] = value
+
+            runs = []
+            for index in range(args.runs):
+                run = run_once(repo_path, commit, env, args.warm, args.verbose)
+                print(f"Run {index + 1}/{args.runs}: {run['total_seconds']}s")
+                runs.append(run)
+            fake_stats = {
+                "requests": server.stats.requests,
+                "rate_limited": server.stats.rate_limited,
+                "peak_in_flight": server.stats.peak_in_flight,
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    summary = aggregate(runs)
+    print_summary(summary)
+    print(f"Fake OpenAI: {fake_stats['requests']} requests, {fake_stats['rate_limited']} rate limited, "
+          f"peak of {fake_stats['peak_in_flight']} in flight")
+
+    result = {
+        "analyzer_commit": _analyzer_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "repo_spec": vars(spec),
+        "fake_openai": vars(fake_config),
+        "fake_openai_stats": fake_stats,
+        "options": {"runs": args.runs, "warm": args.warm, "llm_cache": args.llm_cache, "set": args.set},
+        "summary": summary,
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResult written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if any(baseline.get(key) != result[key] for key in ("repo_spec", "fake_openai", "options")):
+            print("Warning: baseline was produced with a different repository spec, fake server or options.")
+        if compare(summary, baseline["summary"], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
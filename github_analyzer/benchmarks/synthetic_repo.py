@@ -0,0 +1,158 @@
+"""
+Gerador de repositórios git sintéticos para benchmarks.
+
+O conteúdo é determinístico para uma mesma semente, então execuções em commits
+diferentes do analisador medem exatamente o mesmo repositório.
+
+Uso: python -m benchmarks.synthetic_repo /tmp/bench-repo --files 200 --languages python=3,javascript=1
+"""
+import argparse
+import os
+import random
+import subprocess
+from dataclasses import dataclass
+from typing import Dict
+
+EXTENSIONS = {"python": ".py", "javascript": ".js", "typescript": ".ts", "java": ".java"}
+
+# Trechos injetados em parte das funções para exercitar o caminho de SAST
+VULNERABLE_SNIPPETS = {
+    "python": "    os.system(arg)\n",
+    "javascript": "    document.body.innerHTML = arg;\n",
+    "typescript": "    document.body.innerHTML = arg;\n",
+    "java": "        Runtime.getRuntime().exec(arg);\n",
+}
+
+
+@dataclass
+class RepoSpec:
+    files: int = 50
+    functions_per_file: int = 6
+    classes_per_file: int = 1
+    modules: int = 8  # Diretórios entre os quais os arquivos são distribuídos
+    languages: str = "python=1"  # Pesos da mistura de linguagens, ex.: python=3,javascript=1
+    commits: int = 10
+    vulnerable_ratio: float = 0.05
+    seed: int = 42
+
+
+def parse_languages(spec: str) -> Dict[str, int]:
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in EXTENSIONS:
+            raise ValueError(f"Unsupported language '{name}'. Choose from {', '.join(EXTENSIONS)}.")
+        weights[name.strip()] = int(weight or 1)
+    return weights
+
+
+def _body(rng: random.Random, language: str, spec: RepoSpec) -> str:
+    statements = {
+        "python": ["    total = total + arg\n", "    items.append(total)\n", "    if total > 10:\n        return total\n"],
+        "javascript": ["    total = total + arg;\n", "    items.push(total);\n", "    if (total > 10) { return total; }\n"],
+        "java": ["        total = total + arg;\n", "        items.add(total);\n", "        if (total > 10) { return total; }\n"],
+    }
+    lines = statements["javascript" if language == "typescript" else language]
+    body = "".join(rng.choice(lines) for _ in range(rng.randint(2, 12)))
+    if rng.random() < spec.vulnerable_ratio:
+        body += VULNERABLE_SNIPPETS[language]
+    return body
+
+
+def _function(rng: random.Random, language: str, name: str, spec: RepoSpec) -> str:
+    body = _body(rng, language, spec)
+    if language == "python":
+        return f"def {name}(arg):\n    total = 0\n    items = []\n{body}    return total\n\n\n"
+    if language == "javascript":
+        return f"function {name}(arg) {{\n    let total = 0;\n    const items = [];\n{body}    return total;\n}}\n\n"
+    if language == "typescript":
+        return f"function {name}(arg: any): number {{\n    let total = 0;\n    const items: number[] = [];\n{body}    return total;\n}}\n\n"
+    return f"    public int {name}(int arg) {{\n        int total = 0;\n        java.util.List<Integer> items = new java.util.ArrayList<>();\n{body}        return total;\n    }}\n\n"
+
+
+def _class(rng: random.Random, language: str, name: str, spec: RepoSpec) -> str:
+    methods = [_function(rng, language, f"method_{i}", spec) for i in range(3)]
+    if language == "python":
+        indented = "".join("    " + line if line.strip() else line for method in methods for line in method.splitlines(True))
+        return f"class {name}:\n{indented}"
+    if language in ("javascript", "typescript"):
+        members = "".join(method.replace("function ", "    ", 1) for method in methods)
+        return f"class {name} {{\n{members}}}\n\n"
+    return f"    public static class {name} {{\n{''.join(methods)}    }}\n\n"
+
+
+def render_file(rng: random.Random, language: str, index: int, spec: RepoSpec, revision: int = 0) -> str:
+    functions = spec.functions_per_file + revision
+    parts = [_function(rng, language, f"handler_{index}_{i}", spec) for i in range(functions)]
+    parts += [_class(rng, language, f"Service{index}_{i}", spec) for i in range(spec.classes_per_file)]
+    if language == "python":
+        return "import os\n\n\n" + "".join(parts)
+    if language == "java":
+        return f"public class File{index} {{\n{''.join(parts)}}}\n"
+    return "".join(parts)
+
+
+def _git(path: str, *args: str):
+    subprocess.run(
+        ["git", "-C", path, "-c", "user.name=Benchmark", "-c", "user.email=bench@example.com", *args],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+
+
+def generate_repo(path: str, spec: RepoSpec) -> str:
+    """Cria o repositório em `path` (que não deve existir) e devolve o hash do último commit."""
+    rng = random.Random(spec.seed)
+    weights = parse_languages(spec.languages)
+    os.makedirs(path)
+    _git(path, "init", "-q", "-b", "main")
+
+    with open(os.path.join(path, "README.md"), "w") as f:
+        f.write("# Synthetic benchmark repository\n\nGenerated by benchmarks/synthetic_repo.py.\n")
+    with open(os.path.join(path, "requirements.txt"), "w") as f:
+        f.write("fastapi\n")
+
+    files = []
+    for index in range(spec.files):
+        language = rng.choices(list(weights), weights=list(weights.values()))[0]
+        name = f"File{index}" if language == "java" else f"file_{index}"
+        rel_path = os.path.join(f"module_{index % spec.modules}", name + EXTENSIONS[language])
+        files.append((rel_path, language, index))
+        os.makedirs(os.path.join(path, os.path.dirname(rel_path)), exist_ok=True)
+        with open(os.path.join(path, rel_path), "w") as f:
+            f.write(render_file(rng, language, index, spec))
+    _git(path, "add", "-A")
+    _git(path, "commit", "-q", "-m", "Initial synthetic import")
+
+    # Later commits grow a few files each, like an ordinary development history
+    revisions = {}
+    for commit in range(1, spec.commits):
+        for rel_path, language, index in rng.sample(files, min(len(files), max(1, spec.files // 20))):
+            revisions[rel_path] = revisions.get(rel_path, 0) + 1
+            with open(os.path.join(path, rel_path), "w") as f:
+                f.write(render_file(random.Random(spec.seed + index), language, index, spec, revisions[rel_path]))
+        _git(path, "add", "-A")
+        _git(path, "commit", "-q", "-m", f"Synthetic change {commit}: extend handlers")
+
+    return subprocess.check_output(["git", "-C", path, "rev-parse", "HEAD"], text=True).strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um repositório git sintético")
+    parser.add_argument("path")
+    parser.add_argument("--files", type=int, default=RepoSpec.files)
+    parser.add_argument("--functions-per-file", type=int, default=RepoSpec.functions_per_file)
+    parser.add_argument("--classes-per-file", type=int, default=RepoSpec.classes_per_file)
+    parser.add_argument("--modules", type=int, default=RepoSpec.modules)
+    parser.add_argument("--languages", default=RepoSpec.languages)
+    parser.add_argument("--commits", type=int, default=RepoSpec.commits)
+    parser.add_argument("--vulnerable-ratio", type=float, default=RepoSpec.vulnerable_ratio)
+    parser.add_argument("--seed", type=int, default=RepoSpec.seed)
+    args = parser.parse_args()
+
+    spec = RepoSpec(args.files, args.functions_per_file, args.classes_per_file, args.modules,
+                    args.languages, args.commits, args.vulnerable_ratio, args.seed)
+    print(generate_repo(args.path, spec))
+
+
+if __name__ == "__main__":
+    main()
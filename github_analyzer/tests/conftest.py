@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Settings are read when app.config is imported: tests get dummy credentials and a throwaway DATA_DIR
+for name in ("GITHUB_CLIENT_ID", "GITHUB_CLIENT_SECRET", "OPENAI_API_KEY", "GEMINI_API_KEY", "WEBHOOK_SECRET", "SESSION_SECRET_KEY"):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="analyzer-tests-"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+from app.config import settings
+from app.core_analysis import batching
+from app.core_analysis.artifacts import ArtifactStore
+from app.core_analysis.batching import document_and_scan, pack_units, parse_batch_response
+
+SOURCE = "".join(f"def f{index}(x):\n    return x + {index}\n\n" for index in range(4))
+
+
+def make_units(tmp_path):
+    (tmp_path / "mod.py").write_text(SOURCE)
+    units = []
+    for index in range(4):
+        start = SOURCE.index(f"def f{index}")
+        end = SOURCE.index("\n\n", start)
+        units.append({
+            'file_path': "mod.py", 'language': 'python', 'unit_name': f"f{index}", 'unit_type': 'function',
+            'start_byte': start, 'end_byte': end, 'code_hash': str(index), 'complexity': 1,
+            'vulnerabilities': [], 'security_checked': False, 'documentation_ref': None,
+        })
+    return units
+
+
+def truncated_response(complete: int) -> str:
+    entries = [json.dumps({"id": index, "documentation": f"doc {index}", "vulnerabilities": []}) for index in range(complete)]
+    # Cut mid-entry, as a response that hit max_tokens
+    return '{"units": [' + ", ".join(entries) + ', {"id": %d, "documentation": "doc' % complete
+
+
+def test_truncated_response_keeps_complete_entries():
+    results = parse_batch_response(truncated_response(2), 4)
+    assert sorted(results) == [0, 1]
+    assert results[1]['documentation'] == "doc 1"
+
+
+def test_truncated_batch_falls_back_only_for_missing_units(tmp_path, monkeypatch):
+    units = make_units(tmp_path)
+    artifacts = ArtifactStore(str(tmp_path), str(tmp_path / "artifacts"))
+    requests = []
+
+    async def fake_completion(**kwargs):
+        requests.append(kwargs)
+        return {'choices': [{'message': {'content': truncated_response(2)}}]}
+
+    single = []
+
+    async def document_single(unit):
+        single.append(unit['unit_name'])
+        return f"single {unit['unit_name']}"
+
+    monkeypatch.setattr(batching.openai_client, "create_chat_completion", fake_completion)
+    asyncio.run(document_and_scan(units, "flask", artifacts, document_single, "failed"))
+
+    assert len(requests) == 1
+    assert requests[0]['max_tokens'] == 4 * settings.llm_batch_output_tokens_per_unit
+    assert sorted(single) == ['f2', 'f3']
+    assert [unit['security_checked'] for unit in units] == [True, True, False, False]
+    assert artifacts.documentation(units[0]) == "doc 0"
+    assert artifacts.documentation(units[3]) == "single f3"
+
+
+def test_batches_are_capped_by_the_output_budget(tmp_path, monkeypatch):
+    units = make_units(tmp_path) * 5
+    artifacts = ArtifactStore(str(tmp_path), str(tmp_path / "artifacts"))
+    monkeypatch.setattr(settings, "llm_batch_output_tokens", 1000)
+    monkeypatch.setattr(settings, "llm_batch_output_tokens_per_unit", 300)
+    batch_sizes = []
+
+    async def fake_analyze(batch, framework, artifacts):
+        batch_sizes.append(len(batch))
+        return {index: {'documentation': "doc", 'vulnerabilities': []} for index in range(len(batch))}
+
+    monkeypatch.setattr(batching, "analyze_batch", fake_analyze)
+    asyncio.run(document_and_scan(units, "flask", artifacts, None, "failed"))
+
+    assert batch_sizes and max(batch_sizes) == 3
+    assert sum(batch_sizes) == len(units)
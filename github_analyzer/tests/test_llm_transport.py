@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.utils.llm_transport import CircuitBreaker, CircuitOpen, LLMTransport
+
+
+def open_transport(handler) -> LLMTransport:
+    transport = LLMTransport("http://llm.test", "key")
+    transport.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    # Open, with the reset interval already over: the next request is the half-open probe
+    transport.breaker = CircuitBreaker(threshold=1, reset_seconds=0.05)
+    transport.breaker.failures = 1
+    transport.breaker.opened_at = time.monotonic() - 1
+    return transport
+
+
+def test_cancelled_probe_does_not_keep_the_circuit_open():
+    hang = True
+
+    async def handler(request):
+        if hang:
+            await asyncio.sleep(60)
+        return httpx.Response(200, json={"ok": True})
+
+    async def scenario():
+        nonlocal hang
+        transport = open_transport(handler)
+        probe = asyncio.create_task(transport.post("/chat/completions", {}))
+        await asyncio.sleep(0.01)
+        with pytest.raises(CircuitOpen):
+            await transport.post("/chat/completions", {})
+
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # The unfinished probe counts as a failure: open again, then a new probe after the interval
+        assert transport.breaker.opened_at is not None
+        with pytest.raises(CircuitOpen):
+            await transport.post("/chat/completions", {})
+
+        hang = False
+        await asyncio.sleep(0.06)
+        response = await transport.post("/chat/completions", {})
+        assert response.status_code == 200
+        assert transport.breaker.opened_at is None
+        await transport.client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_probe_failing_with_unexpected_error_reopens_the_circuit():
+    def handler(request):
+        raise httpx.DecodingError("bad body")
+
+    async def scenario():
+        transport = open_transport(handler)
+        with pytest.raises(httpx.DecodingError):
+            await transport.post("/chat/completions", {})
+        assert transport.breaker.failures == 2
+        assert not transport.breaker._probing
+        await transport.client.aclose()
+
+    asyncio.run(scenario())
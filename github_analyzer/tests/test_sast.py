@@ -0,0 +1,49 @@
+from app.core_analysis.agents.security import prefilter
+from app.core_analysis.artifacts import ArtifactStore
+from app.core_analysis.parsing import parse_files
+
+ROUTES = '''from flask import Flask
+
+app = Flask(__name__)
+
+
+@app.get("/files/<name>")
+def read_file(name):
+    with open(name) as f:
+        return f.read()
+
+
+def helper(name):
+    return name.upper()
+'''
+
+
+def parsed_units(tmp_path, source):
+    path = tmp_path / "routes.py"
+    path.write_text(source)
+    [record] = parse_files([("routes.py", str(path))])
+    assert record['error'] is None
+    return [
+        {**unit, 'file_path': "routes.py", 'language': record['language'], 'vulnerabilities': [], 'security_checked': False}
+        for unit in record['units']
+    ]
+
+
+def test_decorated_route_without_request_access_is_escalated(tmp_path):
+    units = {unit['unit_name']: unit for unit in parsed_units(tmp_path, ROUTES)}
+    artifacts = ArtifactStore(str(tmp_path), str(tmp_path / "artifacts"))
+
+    escalated = prefilter(list(units.values()), artifacts)
+
+    assert [unit['unit_name'] for unit, _ in escalated] == ['read_file']
+    assert units['helper']['security_checked'] is True
+    assert artifacts.decorators(units['read_file']).startswith('@app.get("/files/<name>")')
+    assert artifacts.code(units['read_file']).startswith('def read_file')
+
+
+def test_decorators_are_part_of_the_fingerprint(tmp_path):
+    plain = parsed_units(tmp_path, "def handler(name):\n    return open(name).read()\n")[0]
+    route = parsed_units(tmp_path, "@app.get('/<name>')\ndef handler(name):\n    return open(name).read()\n")[0]
+
+    assert plain['fingerprint'] != route['fingerprint']
+    assert plain['code_hash'] != route['code_hash']